@@ -0,0 +1,64 @@
+#! /usr/bin/python
+
+
+"""OT Linearization benchmarks.
+
+Usage:
+    benchmark.py run [options] [<output>]
+    benchmark.py case [options] <terminals> [<depth>] [<remerges>] [<constraints>]
+    benchmark.py compare [--threshold=X] <old> <new>
+
+Options:
+    -h, --help       Show this screen.
+    --quick          Run the small suite only.
+    -r N             Time each stage as the best of N runs [default: 3].
+    --stages=LIST    Comma-separated stages to run (default: all of them).
+    --threshold=X    Flag slowdowns by more than a factor X [default: 1.25].
+
+run measures the standard suite of synthetic trees (see bin/bench.py) and
+saves the results as JSON to <output>, if given. case measures a single
+synthetic tree. compare matches the results of two saved runs.
+"""
+
+
+from docopt import docopt
+import sys
+import tabulate
+
+from bin import bench
+
+
+def _log(result):
+	print(f"{result['case']:<16} {result['stage']:<11} "
+		  f"{result['seconds']:>10.4f}s {result['peak_bytes']:>12,d}B")
+
+
+if __name__ == '__main__':
+
+	args = docopt(__doc__)
+	stages = args['--stages'].split(',') if args['--stages'] else bench.STAGES
+
+	if args['run']:
+		results = bench.run_suite(bench.suite(quick = args['--quick']),
+								  repeat = int(args['-r']), stages = stages,
+								  log = _log)
+		if args['<output>']:
+			bench.save(results, args['<output>'])
+
+	elif args['case']:
+		params = [int(args[p]) if args[p] else None
+				  for p in ('<depth>', '<remerges>', '<constraints>')]
+		bench.run_suite([(int(args['<terminals>']), params[0],
+						  params[1] or 0, params[2] or 3)],
+						repeat = int(args['-r']), stages = stages, log = _log)
+
+	elif args['compare']:
+		old, new = bench.load(args['<old>']), bench.load(args['<new>'])
+		rows = bench.compare(old, new, float(args['--threshold']))
+		print(f"{old['commit']} -> {new['commit']}")
+		print(tabulate.tabulate(rows, headers = ['case', 'stage', 'old (s)',
+												 'new (s)', 'ratio', 'old peak',
+												 'new peak', ''],
+								floatfmt = '.4f'))
+		if any(row[-1] for row in rows):
+			sys.exit(1)
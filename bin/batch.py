@@ -0,0 +1,156 @@
+#! /usr/bin/python
+
+"""
+
+Provides `otlinearize.py batch`: evaluating a stream of jobs, one JSON object
+per line, and writing one JSON line per result as soon as it is ready.
+
+A job is a request as for the service (see bin.service), with a few more
+fields:
+
+	kind		'tableau' (the default) or 'typology'
+	path		for a tableau, a tree file, instead of "tree"
+	paths		for a typology, tree files, instead of "trees"
+	format		'json' (the default), 'ascii' or 'latex'
+	id			echoed back with the result; by default, the job's line number
+
+Trees read from files are named after them, as by parseTreeFile. Each result
+is {"id": id, "result": to_json()} for the json format, {"id": id,
+"output": text} for the others, or {"id": id, "error": message}.
+
+All the jobs are evaluated by one Evaluator, so trees, precsets and tableaux
+are shared between them. With several workers, jobs go out to forked
+processes with an Evaluator each, and the results come back (and are
+written) in the order they finish.
+
+"""
+
+import json
+import os
+
+from bin.evaluator import Evaluator, RequestError
+
+
+FORMATS = ('json', 'ascii', 'latex')
+
+
+_evaluator = None # the Evaluator of this process, or of a worker
+
+
+def _init_worker(cache):
+	global _evaluator
+	_evaluator = Evaluator(cache)
+
+
+def _read(path):
+	# a tree file, as (text, name)
+	if not isinstance(path, str):
+		raise RequestError("Tree paths must be strings")
+	try:
+		with open(path) as f:
+			text = f.read()
+	except OSError as e:
+		raise RequestError(f"Can't read {path}: {e.strerror}")
+	return((text, os.path.basename(path).split('.')[0]))
+
+
+def _request(job):
+	# the Evaluator's request for a job, with any tree files read in
+	request = dict(job)
+	if 'path' in request:
+		request['tree'], name = _read(request.pop('path'))
+		request.setdefault('name', name)
+	if 'paths' in request:
+		paths = request.pop('paths')
+		if not isinstance(paths, list):
+			raise RequestError("'paths' must be a list of tree files")
+		texts, names = zip(*[_read(p) for p in paths]) if paths else ((), ())
+		request['trees'] = list(texts)
+		request.setdefault('names', list(names))
+	return(request)
+
+
+def run_job(job, evaluator = None):
+	"""
+	Evaluates one job (a dict, with its id) on the evaluator (by default,
+	this process's). Returns the result line's dict; errors in the job are
+	reported in it rather than raised.
+	"""
+	evaluator = evaluator or _evaluator
+	result = {'id': job.get('id')}
+	try:
+		kind = job.get('kind', 'tableau')
+		format = job.get('format', 'json')
+		if format not in FORMATS:
+			raise RequestError(f"Unknown format: {format}")
+		output = evaluator.evaluate(kind, _request(job))
+		if format == 'json':
+			if kind == 'tableau':
+				result['result'] = output.to_json(
+					include_bounded = bool(job.get('all')))
+			else:
+				result['result'] = output.to_json()
+		elif kind == 'tableau':
+			bounded = bool(job.get('all'))
+			result['output'] = (output.print_ascii(include_bounded = bounded)
+								if format == 'ascii' else
+								output.print_tabular(include_bounded = bounded))
+		else:
+			result['output'] = (output.print_ascii() if format == 'ascii'
+								else output.print_tabular())
+	except RequestError as e:
+		result['error'] = str(e)
+	except Exception as e: # as the service's 500s; the batch goes on
+		result['error'] = f"{type(e).__name__}: {e}"
+	return(result)
+
+
+def read_jobs(lines):
+	# Yields each job of a JSON lines stream, with its id; a line that isn't
+	# a JSON object is passed on as its error message. Blank lines are skipped.
+	for number, line in enumerate(lines, 1):
+		if not line.strip():
+			continue
+		try:
+			job = json.loads(line)
+		except ValueError as e:
+			yield({'id': number}, f"Bad job: {e}")
+			continue
+		if not isinstance(job, dict):
+			yield({'id': number}, "Jobs must be JSON objects")
+			continue
+		job.setdefault('id', number)
+		yield(job, None)
+
+
+def _run(item):
+	job, error = item
+	if error is not None:
+		return(dict(job, error = error))
+	return(run_job(job))
+
+
+def run_batch(lines, out, workers = 1, cache = None):
+	"""
+	Evaluates the jobs of a JSON lines stream, writing each result to out as
+	one JSON line, flushed as soon as it's ready. With several workers, the
+	results are written in the order they finish.
+
+	cache - optionally, a ResultCache directory (each worker connects to it
+		separately)
+	"""
+	jobs = read_jobs(lines)
+	if workers > 1:
+		from bin.parallel import _context
+		with _context().Pool(workers, _init_worker, (cache,)) as pool:
+			for result in pool.imap_unordered(_run, jobs):
+				_write(result, out)
+		return
+	_init_worker(cache)
+	for item in jobs:
+		_write(_run(item), out)
+
+
+def _write(result, out):
+	out.write(json.dumps(result) + '\n')
+	out.flush()
@@ -0,0 +1,226 @@
+#! /usr/bin/python
+
+"""
+
+Provides the benchmark harness: synthetic trees of a given size, timed and
+memory-profiled runs of each stage of an evaluation, and comparison of
+results between runs.
+
+Synthetic trees have a spine of `depth` heads, each taking the next as its
+complement; the remaining terminals are attached as specifiers, spread over
+the spine from the top; then `remerges` phrases are moved to specifiers of
+the root, lowest first. The stages measured for a tree are:
+
+	parse		parseTreeString on the tree's text
+	precsets	building every constraint's precset (with cold caches)
+	gen			generating the candidates
+	score		Tableau._eval_constraints
+	contenders	Tableau._find_contenders
+	typology	Typology.__init__, over the tree and its variants with fewer
+				remerges
+
+Each stage is timed (the best of `repeat` runs) and then run once more under
+tracemalloc for its peak memory. Results are lists of dicts, saved as JSON
+along with the commit they were measured on.
+
+"""
+
+from string import ascii_uppercase
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+
+from bin.mtree import parseTreeString
+from bin.con import Antisymmetry, HeadFinality
+from bin.gen import Gen
+from bin.tableau import Tableau, Typology
+from bin.linconstraint import precset_cache
+from bin.relations import relation_cache
+
+
+STAGES = ('parse', 'precsets', 'gen', 'score', 'contenders', 'typology')
+
+
+def synthetic_tree(terminals, depth = None, remerges = 0):
+	"""
+	Returns the text (in the format of parseTreeString) of a synthetic tree
+	with the given number of terminals (at most 26), spine depth (all of the
+	terminals by default) and number of remerged phrases.
+	"""
+	if not 1 <= terminals <= len(ascii_uppercase):
+		raise ValueError(f"Between 1 and {len(ascii_uppercase)} terminals")
+	depth = terminals if depth is None else depth
+	if not 1 <= depth <= terminals:
+		raise ValueError("The depth must be between 1 and the terminals")
+	labels = ascii_uppercase[:terminals]
+	spine, specs = labels[:depth], labels[depth:]
+
+	lines = [', '.join(labels)]
+	level = {h: 1 for h in labels} # projection level each head is at
+	for s in specs:
+		lines.append(f"{s}0")
+	lines.append(f"{spine[-1]}0")
+	movable = [] # maximal projections, bottom-up
+	for i in reversed(range(depth)):
+		head = spine[i]
+		if i < depth - 1:
+			below = spine[i + 1]
+			lines.append(f"{head}0, {below}{level[below]}")
+		for s in specs[i::depth]:
+			lines.append(f"{head}{level[head]}, {s}1")
+			level[head] += 1
+			movable.append(f"{s}1")
+		if i: movable.append(f"{head}{level[head]}")
+
+	root = spine[0]
+	for r in range(remerges):
+		if not movable:
+			raise ValueError("Nothing to remerge in a tree of one terminal")
+		lines.append(f"{root}{level[root]}, {movable[r % len(movable)]}")
+		level[root] += 1
+	return('\n'.join(lines) + '\n')
+
+
+def constraint_set(count, terminals = 26):
+	# Antisymmetry, HeadFinality, then HeadFinality relativized to the
+	# spine phrases BP, CP, ... in turn
+	cons = [Antisymmetry(), HeadFinality()]
+	for label in ascii_uppercase[1:terminals]:
+		if len(cons) >= count: break
+		cons.append(HeadFinality(alpha = label + 'P'))
+	return(cons[:count])
+
+
+def _measure(stage, run, repeat):
+	# the best time of repeat runs of run(), and its peak memory
+	best = None
+	for _ in range(repeat):
+		start = time.perf_counter()
+		run()
+		elapsed = time.perf_counter() - start
+		best = elapsed if best is None else min(best, elapsed)
+	tracemalloc.start()
+	run()
+	_, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	return({'stage': stage, 'seconds': best, 'peak_bytes': peak})
+
+
+def _cold(tree = None):
+	# Clears the shared caches, and the relations the tree has kept for
+	# itself, so they are all built again
+	precset_cache.clear()
+	relation_cache.clear()
+	if tree is not None:
+		tree._relations = None
+
+
+def bench_case(terminals, depth = None, remerges = 0, constraints = 3,
+			   repeat = 3, stages = STAGES):
+	"""
+	Measures the stages for one synthetic tree; returns one result dict per
+	stage, with the case's parameters.
+	"""
+	text = synthetic_tree(terminals, depth, remerges)
+	tree = parseTreeString(text, name = 'synthetic')
+	cons = constraint_set(constraints, terminals)
+	gen = Gen()
+	tab = Tableau(tree, cons, gen = gen, vectors = [])
+
+	def precsets():
+		_cold(tree)
+		for con in cons:
+			con.get_precset(tree)
+
+	def typology():
+		_cold()
+		variants = [parseTreeString(synthetic_tree(terminals, depth, r))
+					for r in range(remerges + 1)]
+		Typology(variants, cons, gen = Gen())
+
+	runs = {
+		'parse': lambda: parseTreeString(text),
+		'precsets': precsets,
+		'gen': lambda: list(gen.stream(tree)),
+		'score': tab._eval_constraints,
+		'contenders': tab._find_contenders,
+		'typology': typology,
+	}
+	params = {'terminals': terminals, 'depth': depth or terminals,
+			  'remerges': remerges, 'constraints': constraints}
+	case = 't{terminals}-d{depth}-r{remerges}-c{constraints}'.format(**params)
+
+	results = []
+	for stage in stages:
+		if stage == 'contenders':
+			tab.vectors = tab._eval_constraints() # so there's something to do
+		results.append(dict(case = case, **params,
+							**_measure(stage, runs[stage], repeat)))
+	return(results)
+
+
+def suite(quick = False):
+	# The parameters of the standard cases: (terminals, depth, remerges,
+	# constraints). The quick suite is small enough for a test run.
+	if quick:
+		return([(4, 2, 0, 3), (4, 3, 1, 3), (5, 3, 2, 4)])
+	cases = []
+	for terminals in (4, 6, 8):
+		for remerges in (0, 2, 4):
+			cases.append((terminals, terminals // 2 + 1, remerges, 3))
+	for constraints in (2, 4, 6, 8):
+		cases.append((7, 4, 2, constraints))
+	return(cases)
+
+
+def run_suite(cases, repeat = 3, stages = STAGES, log = None):
+	# Measures every case; log, if given, is called with each result
+	results = []
+	for case in cases:
+		for result in bench_case(*case, repeat = repeat, stages = stages):
+			if log: log(result)
+			results.append(result)
+	return(results)
+
+
+def _commit():
+	try:
+		return(subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+							  capture_output = True, text = True,
+							  check = True).stdout.strip())
+	except (OSError, subprocess.CalledProcessError):
+		return(None)
+
+
+def save(results, path):
+	with open(path, 'w') as f:
+		json.dump({'commit': _commit(),
+				   'python': platform.python_version(),
+				   'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+				   'results': results}, f, indent = 1)
+
+
+def load(path):
+	with open(path) as f:
+		return(json.load(f))
+
+
+def compare(old, new, threshold = 1.25):
+	"""
+	Matches the results of two runs (as loaded) by case and stage. Returns
+	rows of (case, stage, old seconds, new seconds, ratio, old peak, new
+	peak, flag), where the flag marks a slowdown by more than threshold.
+	"""
+	before = {(r['case'], r['stage']): r for r in old['results']}
+	rows = []
+	for r in new['results']:
+		o = before.get((r['case'], r['stage']))
+		if o is None:
+			continue
+		ratio = r['seconds'] / o['seconds'] if o['seconds'] else float('inf')
+		rows.append((r['case'], r['stage'], o['seconds'], r['seconds'], ratio,
+					 o['peak_bytes'], r['peak_bytes'],
+					 'SLOWER' if ratio > threshold else ''))
+	return(rows)
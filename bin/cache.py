@@ -0,0 +1,100 @@
+#! /usr/bin/python
+
+"""
+
+Provides the ResultCache class: a persistent, content-addressed store of
+evaluated tableaux, kept in an sqlite database inside a cache directory.
+
+Results are keyed by a hash of everything that determines them: the
+structural fingerprint of the tree, the constraints (class and parameters,
+such as the HeadFinality alpha), and the Gen settings (candidate function and
+silent terminals). Reparsing an unchanged tree file therefore hits the cache,
+and so does any other tree with the same structure. Each entry holds the
+VectorStore of violation vectors and the contender vectors.
+
+The cache is bounded by the total size of its entries; when it grows past
+`max_bytes`, the least recently used entries are deleted.
+
+Gens built on anonymous functions (lambdas, closures) have no stable identity
+across runs, so their results are never cached.
+
+"""
+
+import hashlib
+import os
+import pickle
+import sqlite3
+import time
+
+from bin.instrument import count
+
+
+class ResultCache:
+
+	def __init__(self, path, max_bytes = 2**30):
+		# path - the cache directory (created if necessary)
+		# max_bytes - the total size of entries to keep
+		os.makedirs(path, exist_ok = True)
+		self.path = path
+		self.max_bytes = max_bytes
+		self.db = sqlite3.connect(os.path.join(path, 'results.sqlite'),
+								  check_same_thread = False)
+		self.db.execute('CREATE TABLE IF NOT EXISTS results '
+						'(key TEXT PRIMARY KEY, value BLOB, '
+						'size INTEGER, accessed REAL)')
+		self.db.commit()
+		self.hits = 0
+		self.misses = 0
+
+	def key(self, inp, constraints, gen, *extra):
+		# The content address of a result, or None if it can't be cached.
+		settings = gen.settings()
+		if settings is None:
+			return(None)
+		spec = (inp.fingerprint, [con.key for con in constraints],
+				settings, extra)
+		return(hashlib.sha1(repr(spec).encode()).hexdigest())
+
+	def get(self, key):
+		# The value stored under key, or None
+		row = self.db.execute('SELECT value FROM results WHERE key = ?',
+							  (key,)).fetchone()
+		if row is None:
+			self.misses += 1
+			count('result cache misses')
+			return(None)
+		self.hits += 1
+		count('result cache hits')
+		self.db.execute('UPDATE results SET accessed = ? WHERE key = ?',
+						(time.time(), key))
+		self.db.commit()
+		return(pickle.loads(row[0]))
+
+	def __contains__(self, key):
+		return(self.db.execute('SELECT 1 FROM results WHERE key = ?',
+							   (key,)).fetchone() is not None)
+
+	def put(self, key, value):
+		blob = pickle.dumps(value, protocol = pickle.HIGHEST_PROTOCOL)
+		self.db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+						(key, blob, len(blob), time.time()))
+		self._evict()
+		self.db.commit()
+
+	def _evict(self):
+		# drop least recently used entries until we're within bounds
+		total = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM results'
+								).fetchone()[0]
+		for key, size in self.db.execute('SELECT key, size FROM results '
+										 'ORDER BY accessed').fetchall():
+			if total <= self.max_bytes:
+				break
+			self.db.execute('DELETE FROM results WHERE key = ?', (key,))
+			total -= size
+
+	def clear(self):
+		self.db.execute('DELETE FROM results')
+		self.db.commit()
+
+	def __len__(self):
+		return(self.db.execute('SELECT COUNT(*) FROM results').fetchone()[0])
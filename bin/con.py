@@ -23,9 +23,11 @@ class Antisymmetry(LinConstraint):
 	def iterator(self, tree):
 		# Iterate over words and sets of terminals
 		# asymmetrically-totally-ccommanded by those words
+		# (read off the tree's bulk relation rows)
+		rel = tree.relations
 		for word in tree.words:
-			followers = [n for n in tree.terminals if word.asym_tccommand(n)]
-			yield (word, followers)
+			row = rel.row('asym_tccommand', word) & rel.tables.terminal_mask
+			yield (word, rel.members(row))
 
 
 	def filter(self,pair,tree):
@@ -52,10 +54,19 @@ class HeadFinality(LinConstraint):
 		# This one needs to do something funny to account for the alpha
 		if not alpha:
 			super().__init__(name) # pass on the name as is
-			self.alpha = lambda x: x.root # a function to grab the root
 		else:
 			super().__init__(name + '-' + alpha) # there was an explicit alpha
-			self.alpha = lambda x: x[alpha] # function to graph alpha node
+		self.alpha = alpha # label of the alpha node, or None for the root
+
+	@property
+	def key(self):
+		return(super().key + (self.alpha,))
+
+	def alpha_node(self,tree):
+		# the node whose domain the constraint is relativized to
+		if not self.alpha:
+			return(tree.root)
+		return(tree[self.alpha])
 
 	def iterator(self, tree):
 		# iterate over branching nodes
@@ -63,17 +74,54 @@ class HeadFinality(LinConstraint):
 
 	def filter(self,node,tree):
 		# return true only for those nodes dominated by alpha
-		alpha = self.alpha(tree)
+		alpha = self.alpha_node(tree)
 		return(alpha.dominates(node))
 
 	def reduce(self,node):
 		# make a prec: 
 		# terminals dominated by the head and path-commanded by node <
 		# terminals dominated by the child and path-commanded by node
-		preceders = set([x for x in node.child.terminals_dominated
-						 if node.path_command(x) and node.child.path_command(x)])
-		followers = set([x for x in node.head.terminals_dominated
-						 if node.path_command(x) and not node.child.path_command(x)])
+		# (read off the tree's bulk relation rows)
+		rel = node.tree.relations
+		terminals = rel.tables.terminal_mask
+		commanded = rel.row('path_command', node)
+		by_child = rel.row('path_command', node.child)
+		preceders = rel.row('dominates', node.child) & terminals
+		followers = rel.row('dominates', node.head) & terminals
+		preceders = set(rel.members(preceders & commanded & by_child))
+		followers = set(rel.members(followers & commanded & ~by_child))
 		return((preceders,followers))
 
 
+CONSTRAINTS = {'Antisymmetry': Antisymmetry, 'HeadFinality': HeadFinality}
+
+
+def build_constraints(specs = None, alpha = None):
+	"""
+	Builds constraints from specs, each either a name ('Antisymmetry',
+	'HeadFinality', or 'HeadFinality-BP' for HeadFinality with alpha BP) or a
+	dict with a 'type' and keyword arguments ({'type': 'HeadFinality',
+	'alpha': 'BP'}). Without specs, returns the default set: Antisymmetry,
+	HeadFinality, and HeadFinality with the given alpha (BP by default).
+	Raises ValueError for a bad spec.
+	"""
+	if specs is None:
+		return([Antisymmetry(), HeadFinality(),
+				HeadFinality(alpha = alpha or 'BP')])
+	constraints = []
+	for spec in specs:
+		if isinstance(spec, str):
+			kind, _, alpha = spec.partition('-')
+			kwargs = {'alpha': alpha} if alpha else {}
+		elif isinstance(spec, dict) and 'type' in spec:
+			kwargs = dict(spec)
+			kind = kwargs.pop('type')
+		else:
+			raise ValueError(f"Bad constraint spec: {spec!r}")
+		if kind not in CONSTRAINTS:
+			raise ValueError(f"Unknown constraint: {kind}")
+		try:
+			constraints.append(CONSTRAINTS[kind](**kwargs))
+		except TypeError:
+			raise ValueError(f"Bad constraint spec: {spec!r}")
+	return(constraints)
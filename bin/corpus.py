@@ -0,0 +1,204 @@
+#! /usr/bin/python
+
+"""
+
+Provides a compact binary format for collections of trees, so that a whole
+corpus can be stored in (and loaded from) one file.
+
+A corpus file holds the terminals and merges of every tree as arrays of
+little-endian unsigned ints, indexing into one table of label strings (each
+label is stored once, however many trees use it):
+
+	header		magic b'OTLC', version, number of trees, number of strings,
+				string bytes, number of terminals, number of merges
+	strings		offsets (number of strings + 1), then the UTF-8 bytes,
+				padded to a multiple of 4
+	trees		per tree: name, first terminal, terminal count, first merge,
+				merge count
+	terminals	string indices
+	merges		(head, child) string index pairs
+
+NONE marks a missing child (a unary merge) or name. Corpus maps the file into
+memory and builds each MTree on request, straight from the arrays; nothing is
+parsed from text. write_corpus and convert create corpus files, from MTrees
+and from tree files respectively.
+
+"""
+
+from array import array
+from collections.abc import Sequence
+import mmap
+import struct
+import sys
+
+from bin.mtree import MTree, parseTreeFile
+
+
+MAGIC = b'OTLC'
+VERSION = 1
+NONE = 0xFFFFFFFF
+HEADER = struct.Struct('<4s6I')
+TREE = 5 # ints per entry of the tree table
+
+
+class CorpusError(Exception):
+	pass
+
+
+def _ints(values = ()):
+	return(array('I', values))
+
+
+def _write_ints(f, ints):
+	if sys.byteorder == 'big':
+		ints = _ints(ints)
+		ints.byteswap()
+	ints.tofile(f)
+
+
+def write_corpus(path, trees):
+	"""
+	Writes an iterable of MTrees to a corpus file. Trees are stored as their
+	terminals and merge lists, so edits made with add_merge etc. are kept.
+	"""
+	strings = dict() # label -> index
+	def index(label):
+		if label is None:
+			return(NONE)
+		return(strings.setdefault(label, len(strings)))
+
+	table, terminals, merges = _ints(), _ints(), _ints()
+	for tree in trees:
+		table.extend([index(tree.name), len(terminals), len(tree.terminals),
+					  len(merges) // 2, len(tree.merges)])
+		terminals.extend(index(t.label[0]) for t in tree.terminals)
+		for head, child in tree.merges:
+			merges.extend([index(head), index(child)])
+
+	encoded = [label.encode() for label in strings]
+	offsets = _ints([0])
+	for label in encoded:
+		offsets.append(offsets[-1] + len(label))
+	text = b''.join(encoded)
+	text += b'\0' * (-len(text) % 4)
+
+	with open(path, 'wb') as f:
+		f.write(HEADER.pack(MAGIC, VERSION, len(table) // TREE, len(strings),
+							len(text), len(terminals), len(merges) // 2))
+		_write_ints(f, offsets)
+		f.write(text)
+		for ints in (table, terminals, merges):
+			_write_ints(f, ints)
+
+
+def convert(tree_files, path):
+	# Parses tree files (in the text format of parseTreeFile) into a corpus
+	write_corpus(path, (parseTreeFile(fname) for fname in tree_files))
+
+
+class Corpus(Sequence):
+	"""
+	A corpus file, mapped into memory. Indexing or iterating builds MTrees
+	lazily; names lists the tree names without building anything.
+
+	Corpus(path)
+	"""
+
+	def __init__(self, path):
+		self.path = path
+		with open(path, 'rb') as f:
+			try:
+				self._map = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+			except ValueError: # an empty file can't be mapped
+				raise CorpusError(f"{path} is not a valid corpus file")
+		try:
+			self._load()
+		except (struct.error, ValueError, UnicodeDecodeError):
+			self.close()
+			raise CorpusError(f"{path} is not a valid corpus file")
+
+	def _load(self):
+		(magic, version, ntrees, nstrings, nbytes, nterminals,
+		 nmerges) = HEADER.unpack_from(self._map)
+		if magic != MAGIC or version != VERSION:
+			raise ValueError(magic, version)
+		# Check the sections fit the file before viewing any of them, since
+		# the map can't be closed while a view of it is alive
+		size = HEADER.size + nbytes + \
+			   4 * (nstrings + 1 + TREE * ntrees + nterminals + 2 * nmerges)
+		if size != len(self._map):
+			raise ValueError(size, len(self._map))
+		pos = HEADER.size
+		offsets = self._section(pos, nstrings + 1)
+		try:
+			if offsets[-1] > nbytes:
+				raise ValueError(offsets[-1], nbytes)
+			pos += 4 * (nstrings + 1)
+			text = self._map[pos:pos + offsets[-1]]
+			self.strings = [text[a:b].decode()
+							for a, b in zip(offsets, offsets[1:])]
+		finally:
+			if isinstance(offsets, memoryview):
+				offsets.release()
+		pos += nbytes
+		self._table = self._section(pos, TREE * ntrees)
+		pos += 4 * TREE * ntrees
+		self._terminals = self._section(pos, nterminals)
+		pos += 4 * nterminals
+		self._merges = self._section(pos, 2 * nmerges)
+
+	def _section(self, pos, count):
+		# count ints from byte pos, without copying where we can
+		# (the caller has checked that they fit)
+		view = memoryview(self._map)[pos:pos + 4 * count]
+		if sys.byteorder == 'little':
+			return(view.cast('I'))
+		ints = _ints()
+		ints.frombytes(view)
+		view.release()
+		ints.byteswap()
+		return(ints)
+
+	def _string(self, i):
+		return(None if i == NONE else self.strings[i])
+
+	def __getitem__(self, i):
+		if isinstance(i, slice):
+			return([self[j] for j in range(*i.indices(len(self)))])
+		if i < 0:
+			i += len(self)
+		if not 0 <= i < len(self):
+			raise IndexError(i)
+		name, t, tcount, m, mcount = self._table[TREE * i:TREE * (i + 1)]
+		terminals = [self.strings[s] for s in self._terminals[t:t + tcount]]
+		merges = self._merges[2 * m:2 * (m + mcount)]
+		merges = [(self.strings[merges[k]], self._string(merges[k + 1]))
+				  for k in range(0, len(merges), 2)]
+		return(MTree(terminals, merges, name = self._string(name)))
+
+	def __len__(self):
+		return(len(self._table) // TREE)
+
+	@property
+	def names(self):
+		return([self._string(self._table[TREE * i]) for i in range(len(self))])
+
+	def close(self):
+		# The arrays are views of the map; release them before closing it
+		for name in ('_table', '_terminals', '_merges'):
+			section = self.__dict__.pop(name, None)
+			if isinstance(section, memoryview):
+				section.release()
+		self._map.close()
+
+	def __enter__(self):
+		return(self)
+
+	def __exit__(self, *exc):
+		self.close()
+
+
+def load_corpus(path):
+	# Yields the trees of a corpus file one at a time
+	with Corpus(path) as corpus:
+		yield from corpus
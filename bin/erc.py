@@ -0,0 +1,92 @@
+#! /usr/bin/python
+
+"""
+
+Provides functions for working with Elementary Ranking Conditions (ERCs).
+
+An ERC compares a desired winner with a competitor, constraint by constraint:
+'W' where the constraint prefers the winner, 'L' where it prefers the
+competitor, and 'e' where it doesn't care. A set of ERCs is consistent iff
+some total ranking satisfies all of them, i.e. in every ERC some W-constraint
+outranks every L-constraint. Consistency is decided with Recursive Constraint
+Demotion (Tesar & Smolensky 2000), which is polynomial in the number of ERCs
+and constraints.
+
+Languages of a factorial typology are sets of winners whose ERCs are jointly
+consistent; they are built input by input with extend(), and their ranking
+conditions are read off with entails().
+
+"""
+
+
+def erc(winner, loser):
+	# Compares two violation vectors.
+	return(tuple('W' if w < l else 'L' if w > l else 'e'
+				 for w, l in zip(winner, loser)))
+
+
+def bounds(winner, loser):
+	# True if winner harmonically bounds loser: their ERC has a W and no L,
+	# so the loser can't win under any ranking.
+	return(winner != loser and all(w <= l for w, l in zip(winner, loser)))
+
+
+def rcd(ercs, n):
+	# Recursive Constraint Demotion over constraints range(n).
+	# Returns a stratified hierarchy (a list of sets of constraint indices,
+	# highest first) satisfying every ERC, or None if the ERCs are
+	# inconsistent.
+	remaining = set(range(n))
+	ercs = list(ercs)
+	strata = []
+	while remaining:
+		# rankable: constraints that prefer no remaining loser
+		stratum = {c for c in remaining
+				   if not any(e[c] == 'L' for e in ercs)}
+		if not stratum:
+			return(None)
+		strata.append(stratum)
+		remaining -= stratum
+		# ERCs with a W in this stratum are now satisfied
+		ercs = [e for e in ercs if not any(e[c] == 'W' for c in stratum)]
+	return(strata)
+
+
+def consistent(ercs, n):
+	return(rcd(ercs, n) is not None)
+
+
+def optimizable(vector, competitors):
+	# True if vector is optimal under some ranking among the competitors
+	# (which may include vector itself).
+	ercs = [erc(vector, w) for w in competitors if w != vector]
+	return(consistent(ercs, len(vector)))
+
+
+def entails(ercs, n, a, b):
+	# True if every ranking consistent with the ERCs ranks a above b: adding
+	# the opposite requirement (b over a) makes them inconsistent.
+	opposite = tuple('W' if c == b else 'L' if c == a else 'e'
+					 for c in range(n))
+	return(not consistent(list(ercs) + [opposite], n))
+
+
+def options(vectors):
+	# For each of a set of competing vectors, the ERCs required for it to win.
+	# Returns (vector, frozenset of ERCs) pairs; ERCs without an L are always
+	# satisfied and are left out.
+	for v in vectors:
+		ercs = (erc(v, w) for w in vectors if w != v)
+		yield((v, frozenset(e for e in ercs if 'L' in e)))
+
+
+def extend(languages, choices, n):
+	# Extends partial languages by one more input. languages is an iterable of
+	# (key, ERCs) pairs, choices an iterable of (choice, ERCs) pairs; yields
+	# (key + (choice,), combined ERCs) for every consistent combination.
+	choices = list(choices)
+	for key, ercs in languages:
+		for choice, new in choices:
+			combined = ercs | new
+			if consistent(combined, n):
+				yield((key + (choice,), combined))
@@ -0,0 +1,116 @@
+#! /usr/bin/python
+
+"""
+
+Provides the Evaluator, which answers JSON-style requests for tableaux and
+typologies while keeping its work warm between them: parsed trees keyed by
+their text, and evaluated tableaux keyed by the tree's structure, the
+constraints and the silent terminals (the precset and relation caches are
+shared as usual). It is used by `otlinearize.py serve` and `batch`.
+
+"""
+
+from bin.lru import LRUCache
+from bin.mtree import parseTreeString, TreeError
+from bin.con import build_constraints
+from bin.gen import Gen
+from bin.tableau import Tableau, Typology
+from bin.linconstraint import precset_cache
+from bin.relations import relation_cache
+from bin.cache import ResultCache
+
+
+class RequestError(Exception):
+	pass
+
+
+class Evaluator:
+
+	def __init__(self, cache = None, maxsize = 256):
+		# cache - optionally, a directory for a ResultCache of the tableaux
+		# maxsize - number of trees and of tableaux to keep
+		self.cache = ResultCache(cache) if cache else None
+		self.trees = LRUCache(maxsize) # (text, name) -> MTree
+		self.tableaux = LRUCache(maxsize) # structure and settings -> Tableau
+		self.gens = dict() # silent terminals -> Gen
+
+	def tree(self, text, name = None):
+		if not isinstance(text, str):
+			raise RequestError("Trees must be given as text")
+		try:
+			return(self.trees.get((text, name),
+								  lambda: parseTreeString(text, name = name)))
+		except (TreeError, KeyError, IndexError) as e:
+			raise RequestError(f"Bad tree: {e}")
+
+	def gen(self, null_phon):
+		null_phon = frozenset(null_phon or ())
+		if null_phon not in self.gens:
+			self.gens[null_phon] = Gen(null_phon = set(null_phon))
+		return(self.gens[null_phon])
+
+	def constraints(self, specs, alpha = None):
+		try:
+			return(build_constraints(specs, alpha))
+		except ValueError as e:
+			raise RequestError(str(e))
+
+	def check(self, tree, constraints):
+		# Constraints relativized to a node (HeadFinality's alpha) need the
+		# node to be in the tree
+		for con in constraints:
+			alpha = getattr(con, 'alpha', None)
+			if not alpha: continue
+			try:
+				tree[alpha]
+			except (KeyError, IndexError):
+				where = f"Tree {tree.name}" if tree.name else "The tree"
+				raise RequestError(f"{where} has no node {alpha} "
+								   f"(the alpha of {con})")
+
+	def tableau(self, tree, constraints, gen):
+		# a warm Tableau, shared by every request for the same structure
+		self.check(tree, constraints)
+		key = (tree.fingerprint, tuple(c.key for c in constraints),
+			   gen.key(tree)[1])
+		tab = self.tableaux.get(key, lambda: Tableau(tree, constraints,
+													 gen = gen,
+													 cache = self.cache))
+		if tab.input is not tree: # same structure, another name
+			tab = Tableau(tree, tab.constraints, gen = gen, vectors = tab.vectors)
+		return(tab)
+
+	def handle(self, kind, request):
+		# Evaluates one request; returns the JSON-ready response
+		result = self.evaluate(kind, request)
+		if kind == 'tableau':
+			return(result.to_json(include_bounded = bool(request.get('all'))))
+		return(result.to_json())
+
+	def evaluate(self, kind, request):
+		# Evaluates one request; returns the Tableau or Typology
+		if not isinstance(request, dict):
+			raise RequestError("Requests must be JSON objects")
+		constraints = self.constraints(request.get('constraints'),
+									   request.get('alpha'))
+		gen = self.gen(request.get('null_phon'))
+		if kind == 'tableau':
+			tree = self.tree(request.get('tree'), request.get('name'))
+			return(self.tableau(tree, constraints, gen))
+		if kind == 'typology':
+			texts = request.get('trees')
+			if not isinstance(texts, list):
+				raise RequestError("'trees' must be a list of tree texts")
+			names = request.get('names') or [None] * len(texts)
+			trees = [self.tree(t, n) for t, n in zip(texts, names)]
+			tableaux = [self.tableau(t, constraints, gen) for t in trees]
+			typ = Typology([], constraints, gen = gen)
+			for tree, tab in zip(trees, tableaux):
+				typ.add_input(tree, vectors = tab.vectors)
+			return(typ)
+		raise RequestError(f"Unknown request: {kind}")
+
+	def stats(self):
+		return({name: cache.info()._asdict() for name, cache in
+				[('trees', self.trees), ('tableaux', self.tableaux),
+				 ('precsets', precset_cache), ('relations', relation_cache)]})
@@ -6,30 +6,253 @@
 Provides the Gen class, along with functions for iterating over output
 linearizations given a particular tree input.
 
+A Gen memoizes the candidates it produces. The cache is keyed by the
+structural fingerprint of the input tree and the set of silent terminals, so
+the same tree reparsed (or shared between several typologies) is only
+expanded once. The cache holds at most `maxsize` candidates in memory,
+evicting the least recently used inputs first; if a `spill` directory is
+given, evicted (or oversized) candidate lists are pickled there instead of
+being dropped. A Gen with maxsize 0 and no spill directory caches nothing
+and generates lazily; that's what a Gen nobody else shares should be, since
+its cache could never be reused.
+
+Given classes of interchangeable terminals (see Gen.classes), gen_strings
+produces one order per arrangement of the classes rather than every
+permutation: the members of each class always appear in sorted order. That
+is n! / (k1! k2! ...) orders for classes of sizes k1, k2, ...; expand() gives
+back the orders each one stands for.
 
 """
 
 
-from itertools import permutations
+from itertools import permutations, product
+from collections import OrderedDict, namedtuple
+import hashlib
+import os
+import pickle
+
+from bin.linconstraint import interchangeable
+from bin.instrument import stage, count
 
-def gen_strings(tree, null_phon = {}, spaces = False):
+def gen_strings(tree, null_phon = {}, spaces = False, first = None,
+				classes = None):
+	# If first is given, only the orders starting with that terminal are
+	# generated; the orders for each first terminal, in alphabetical order,
+	# make up the full sequence. If classes are given, the members of each
+	# class only appear in sorted order (so first should be the first member
+	# of a class).
 	null_phon = {t.lower() for t in null_phon}
 	terminals = {t.label[0].lower() for t in tree.terminals}
-	terminals = terminals - null_phon # remove silent things
+	terminals = sorted(terminals - null_phon) # remove silent things
+	if classes is not None:
+		yield from _arrangements(terminals, classes, first)
+		return
+	if first is not None:
+		terminals.remove(first)
+		for perm in permutations(terminals):
+			yield first + ''.join(perm)
+		return
 	for perm in permutations(terminals):
 		yield ''.join(perm)
 
 
+def _arrangements(terminals, classes, first = None):
+	# The orders of the terminals in which the members of each class (and
+	# each terminal in no class, alone) appear in sorted order, in
+	# alphabetical order.
+	grouped = {t for c in classes for t in c}
+	groups = [sorted(set(c) & set(terminals)) for c in classes] + \
+			 [[t] for t in terminals if t not in grouped]
+	groups = sorted(g for g in groups if g)
+	used = [0] * len(groups) # members of each group placed so far
+	order = []
+
+	def _place(choices):
+		if len(order) == len(terminals):
+			yield(''.join(order))
+			return
+		for t, g in sorted((groups[g][used[g]], g) for g in choices
+						   if used[g] < len(groups[g])):
+			order.append(t)
+			used[g] += 1
+			yield from _place(range(len(groups)))
+			used[g] -= 1
+			order.pop()
+
+	if first is None:
+		yield from _place(range(len(groups)))
+	else:
+		yield from _place([g for g in range(len(groups))
+						   if groups[g][0] == first])
+
+
+def expand(candidate, classes):
+	# Yields every order that a candidate generated with classes stands for:
+	# the candidate with the members of each class permuted among their
+	# places in it.
+	places = [[i for i, t in enumerate(candidate) if t in c]
+			  for c in classes if len(c) > 1]
+	for perms in product(*[permutations(candidate[i] for i in p)
+						   for p in places]):
+		order = list(candidate)
+		for p, perm in zip(places, perms):
+			for i, t in zip(p, perm):
+				order[i] = t
+		yield(''.join(order))
+
+
+CacheInfo = namedtuple('CacheInfo',
+					   ['hits', 'misses', 'spill_hits', 'evictions',
+						'size', 'maxsize'])
+
+
 class Gen:
 
-	def __init__(self, function = gen_strings):
+	def __init__(self, function = gen_strings, null_phon = None,
+				 maxsize = 2**20, spill = None):
+		# function - maps an input to an iterable of candidates
+		# null_phon - silent terminals, passed on to function if given
+		# maxsize - maximum number of candidates held in memory (0, with no
+		#	spill directory, for no cache at all)
+		# spill - optional directory for candidate lists evicted from memory
 		self.function = function
-		self.dictionary = dict()
+		self.null_phon = null_phon
+		self.maxsize = maxsize
+		self.spill = spill
+		if spill:
+			os.makedirs(spill, exist_ok = True)
+
+		self.dictionary = OrderedDict() # key -> list of candidates, LRU order
+		self.size = 0 # number of candidates in self.dictionary
+		self.hits = 0
+		self.misses = 0
+		self.spill_hits = 0
+		self.evictions = 0
+
+	def key(self, inp, classes = None):
+		# Cache key: the tree's structure and the set of silent terminals
+		# (and the classes, if any)
+		null_phon = frozenset(t.lower() for t in self.null_phon or ())
+		key = (getattr(inp, 'fingerprint', inp), null_phon)
+		return(key if classes is None else key + (classes,))
 
-	def __call__(self, inp):
+	def classes(self, inp, constraints):
+		# The classes of terminals of an input that are interchangeable under
+		# the constraints, for generating one order per arrangement of them;
+		# None if there are none (every class has one member) or if the
+		# function isn't gen_strings, which can generate them.
+		if self.function is not gen_strings:
+			return(None)
+		null_phon = {t.lower() for t in self.null_phon or ()}
+		alphabet = tuple(sorted({t.label[0].lower() for t in inp.terminals}
+								- null_phon))
+		classes = interchangeable(inp, constraints, alphabet)
+		if len(classes) == len(alphabet):
+			return(None)
+		return(classes)
+
+	@property
+	def caching(self):
+		return(bool(self.maxsize or self.spill))
+
+	def _generate(self, inp, classes):
+		kwargs = dict()
+		if self.null_phon is not None:
+			kwargs['null_phon'] = self.null_phon
+		if classes is not None:
+			kwargs['classes'] = classes
+		return(self.function(inp, **kwargs))
+
+	def settings(self):
+		# Identifies what this Gen produces across runs: the candidate function
+		# and the silent terminals. None if the function is anonymous (a
+		# lambda or a closure), since we can't tell two of those apart.
+		name = getattr(self.function, '__qualname__', '<>')
+		if '<' in name:
+			return(None)
+		null_phon = sorted(t.lower() for t in self.null_phon or ())
+		return((self.function.__module__, name, null_phon))
+
+	def __call__(self, inp, classes = None):
 		# yield the precreated values in the dictionary
-		# otherwise, build them and then yield them
-		yield from self.dictionary.get(inp, list(self.function(inp)))
+		# otherwise, build them, store them, and then yield them
+		# classes - optionally, classes of interchangeable terminals
+		key = self.key(inp, classes)
+		try:
+			candidates = self._lookup(key)
+			self.hits += 1
+			count('gen cache hits')
+		except KeyError:
+			self.misses += 1
+			count('gen cache misses')
+			if not self.caching: # nowhere to keep them, so don't hold them
+				yield from self._generate(inp, classes)
+				return
+			with stage('gen'):
+				candidates = list(self._generate(inp, classes))
+			count('candidates generated', len(candidates))
+			self._store(key, candidates)
+		yield from candidates
+
+	def stream(self, inp, classes = None):
+		# Like calling the Gen, but on a miss the candidates are generated
+		# lazily and not stored, so they never all sit in memory at once.
+		try:
+			candidates = self._lookup(self.key(inp, classes))
+			self.hits += 1
+			count('gen cache hits')
+		except KeyError:
+			self.misses += 1
+			count('gen cache misses')
+			candidates = self._generate(inp, classes)
+		yield from candidates
 
 	def __getitem__(self, inp):
-		yield from self.dictionary[inp]
+		# yield the cached values only; KeyError if inp hasn't been seen
+		yield from self._lookup(self.key(inp))
+
+	def cache_info(self):
+		return(CacheInfo(self.hits, self.misses, self.spill_hits,
+						 self.evictions, self.size, self.maxsize))
+
+	### caching
+
+	def _lookup(self, key):
+		# Returns the candidates for a key, from memory or from the spill
+		# directory. Raises KeyError if they aren't cached anywhere.
+		if key in self.dictionary:
+			self.dictionary.move_to_end(key)
+			return(self.dictionary[key])
+		path = self._spill_path(key)
+		if path and os.path.exists(path):
+			with open(path, 'rb') as f:
+				candidates = pickle.load(f)
+			self.spill_hits += 1
+			self._store(key, candidates)
+			return(candidates)
+		raise KeyError(key)
+
+	def _store(self, key, candidates):
+		if len(candidates) > self.maxsize:
+			self._spill(key, candidates) # too big to keep in memory
+			return
+		self.dictionary[key] = candidates
+		self.size += len(candidates)
+		while self.size > self.maxsize:
+			old_key, old = self.dictionary.popitem(last = False)
+			self.size -= len(old)
+			self.evictions += 1
+			self._spill(old_key, old)
+
+	def _spill_path(self, key):
+		if not self.spill:
+			return(None)
+		name = hashlib.sha1(repr((key[0], sorted(key[1])) + key[2:]).encode()
+							).hexdigest()
+		return(os.path.join(self.spill, name + '.pickle'))
+
+	def _spill(self, key, candidates):
+		path = self._spill_path(key)
+		if path and not os.path.exists(path):
+			with open(path, 'wb') as f:
+				pickle.dump(candidates, f)
@@ -0,0 +1,185 @@
+#! /usr/bin/python
+
+"""
+
+Provides the instrumentation layer: per-stage wall time and peak memory, and
+counters of the work done, collected while a Profiler is active.
+
+The evaluation code marks its stages with `stage(name)` (or the `timed`
+decorator) and reports work with `count(name, n)`. Both are placed at the
+granularity of an input or a constraint, never per candidate, and do nothing
+but test a global when no Profiler is running, so instrumentation costs
+nothing measurable when it is off.
+
+Stages nest; each records its start, duration and (if the Profiler tracks
+memory) the peak traced allocation while it ran. The hit counts of the
+shared precset and relation caches are read off the caches themselves when
+the Profiler stops. Work done in worker processes (with -j) is not seen.
+
+A Profiler reports a JSON summary (stages aggregated by name, each span, and
+the counters) or a Chrome trace, for chrome://tracing or Perfetto.
+
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+
+_profiler = None # the active Profiler, if any
+
+
+def active():
+	return(_profiler is not None)
+
+
+def count(name, n = 1):
+	# Adds n to a counter of the active Profiler
+	if _profiler is not None:
+		_profiler.counters[name] += n
+
+
+@contextmanager
+def stage(name, **args):
+	# Marks a stage; args are recorded with the span
+	if _profiler is None:
+		yield
+		return
+	_profiler._enter(name, args)
+	try:
+		yield
+	finally:
+		_profiler._exit()
+
+
+def timed(name):
+	# Decorator: marks every call of a function as a stage
+	def decorate(function):
+		@wraps(function)
+		def wrapper(*args, **kwargs):
+			if _profiler is None:
+				return(function(*args, **kwargs))
+			with stage(name):
+				return(function(*args, **kwargs))
+		return(wrapper)
+	return(decorate)
+
+
+class Profiler:
+	"""
+	Collects stages and counters while active (between start() and stop(),
+	or in a with block).
+
+	Profiler(memory = True)
+
+	memory - track peak memory with tracemalloc (which slows Python down
+		noticeably, so the times are less accurate)
+	"""
+
+	def __init__(self, memory = True):
+		self.memory = memory
+		self.spans = [] # (name, args, start, seconds, peak bytes, depth)
+		self.counters = Counter()
+		self._stack = [] # open stages: [name, args, start, peak so far]
+		self._caches = None
+
+	def start(self):
+		global _profiler
+		if _profiler is not None:
+			raise RuntimeError('A Profiler is already running')
+		from bin.linconstraint import precset_cache
+		from bin.relations import relation_cache
+		self._caches = {'precset': precset_cache, 'relation': relation_cache}
+		self._baseline = {name: cache.info()
+						  for name, cache in self._caches.items()}
+		self._tracing = self.memory and not tracemalloc.is_tracing()
+		if self._tracing: # otherwise someone else is, or we needn't
+			tracemalloc.start()
+		self._origin = time.perf_counter()
+		_profiler = self
+		return(self)
+
+	def stop(self):
+		global _profiler
+		while self._stack:
+			self._exit()
+		_profiler = None
+		for name, cache in self._caches.items():
+			before, after = self._baseline[name], cache.info()
+			self.counters[f'{name} cache hits'] += after.hits - before.hits
+			self.counters[f'{name} cache misses'] += after.misses - before.misses
+		if self._tracing:
+			tracemalloc.stop()
+
+	def __enter__(self):
+		return(self.start())
+
+	def __exit__(self, *exc):
+		self.stop()
+
+	def _enter(self, name, args):
+		if self.memory:
+			if self._stack: # bank the parent's peak so far
+				peak = tracemalloc.get_traced_memory()[1]
+				self._stack[-1][3] = max(self._stack[-1][3], peak)
+			tracemalloc.reset_peak()
+		self._stack.append([name, args, time.perf_counter(), 0])
+
+	def _exit(self):
+		name, args, start, peak = self._stack.pop()
+		seconds = time.perf_counter() - start
+		if self.memory:
+			peak = max(peak, tracemalloc.get_traced_memory()[1])
+			if self._stack:
+				self._stack[-1][3] = max(self._stack[-1][3], peak)
+			tracemalloc.reset_peak()
+		self.spans.append((name, args, start - self._origin, seconds, peak,
+						   len(self._stack)))
+
+	### reporting
+
+	def stages(self):
+		# {name: {calls, seconds, peak_bytes}}, over every span of a name
+		stages = dict()
+		for name, _, _, seconds, peak, _ in self.spans:
+			entry = stages.setdefault(name, {'calls': 0, 'seconds': 0.0,
+											 'peak_bytes': 0})
+			entry['calls'] += 1
+			entry['seconds'] += seconds
+			entry['peak_bytes'] = max(entry['peak_bytes'], peak)
+		return(stages)
+
+	def report(self):
+		return({'stages': self.stages(),
+				'counters': dict(self.counters),
+				'spans': [{'name': name, 'args': args, 'start': start,
+						   'seconds': seconds, 'peak_bytes': peak,
+						   'depth': depth}
+						  for name, args, start, seconds, peak, depth
+						  in sorted(self.spans, key = lambda s: s[2])]})
+
+	def chrome_trace(self):
+		# The Trace Event Format: one complete ('X') event per span, and the
+		# counters as a final counter ('C') event
+		pid, tid = os.getpid(), threading.get_ident()
+		events = [{'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+				   'ts': start * 1e6, 'dur': seconds * 1e6,
+				   'args': dict(args, peak_bytes = peak)}
+				  for name, args, start, seconds, peak, _ in self.spans]
+		end = max([e['ts'] + e['dur'] for e in events] or [0])
+		events.append({'name': 'counters', 'ph': 'C', 'pid': pid, 'tid': tid,
+					   'ts': end, 'args': dict(self.counters)})
+		return({'traceEvents': events, 'displayTimeUnit': 'ms'})
+
+	def save(self, path, format = 'json'):
+		# format - 'json' for the summary, 'chrome' for a trace
+		if format not in ('json', 'chrome'):
+			raise ValueError(f"Unknown profile format: {format}")
+		data = self.report() if format == 'json' else self.chrome_trace()
+		with open(path, 'w') as f:
+			json.dump(data, f, indent = 1, default = str)
@@ -10,8 +10,12 @@ non-negative integer.
 
 For efficiency, they precompute a precset: a list of 2-tuples of sets such that
 a violation is scored if something in precset[1] precedes something in
-precset[0]. The class maintains an internal dictionary of {input: precset};
-when a new input is encountered, the precset is calculated.
+precset[0]. Precsets are kept in `precset_cache`, shared by every constraint
+instance and keyed by the constraint's key and the input's structural
+fingerprint; when a new input is encountered, the precset is calculated. A
+reparsed tree, or a second instance of the same constraint, starts warm.
+Subclasses whose precsets depend on parameters beyond the name should extend
+`key` accordingly.
 
 Calculating a precset involves:
 	- an iterator that selects particular parts of an input to consider
@@ -21,23 +25,39 @@ Calculating a precset involves:
 To implement a specific constraint, subclass LinConstraint and override those
 three attributes.
 
+For scoring, precsets are compiled into bitmasks over an alphabet of
+pronounced terminals: each precset becomes a pair of ints (preceders,
+followers) with one bit per terminal. A precset is violated iff some preceder
+is still unplaced when its first follower is placed, so a candidate can be
+scored in a single left-to-right pass; see score_candidates. score_deltas
+runs the same pass over just the entries that changed between two precsets,
+to update existing vectors after a tree is edited.
+
+Terminals on the same sides of every precset entry of every constraint are
+interchangeable: swapping them in an order never changes its violations.
+interchangeable() finds the classes of such terminals, so that Gen need only
+produce one order per arrangement of the classes.
+
 """
 
 
+from bin.lru import LRUCache
+from bin.instrument import stage, count
+
+
+precset_cache = LRUCache(maxsize = 4096) # shared by all constraints
+
+
 class LinConstraint:
 
 	def __init__(self,name="LinCon"):
-		self.precsets = dict() # dictionary from inp to precset
+		self.precsets = precset_cache # shared cache of precsets and bitmasks
 		self.name = name
 
 	def __call__(self,inp,out):
 		# (inp,out) -> int
-		precset = self.get_precset(inp)
-		# Map each prec to either 1 or 0 based on the output
-		violations = list(map(lambda x: self.check_viol(x,out),
-							  precset))
-		# Reduce and return
-		return(sum(violations))
+		[(_, vector)] = score_candidates(inp, [self], [out])
+		return(vector[0])
 			
 
 	def __getitem__(self,inp):
@@ -47,11 +67,20 @@ class LinConstraint:
 	def __repr__(self):
 		return(self.name)
 
+	@property
+	def key(self):
+		# identifies the constraint and its parameters across runs
+		cls = type(self)
+		return((cls.__module__, cls.__qualname__, self.name))
+
 	def build_precset(self,inp):
 		# given an input, creates a precset.
-		targets = [i for i in self.iterator(inp) if self.filter(i,inp)]
-		precset = list(map(self.reduce,targets))
-		precset = tuple(map(self.stringify,precset))
+		with stage('precsets', constraint = self.name):
+			targets = [i for i in self.iterator(inp) if self.filter(i,inp)]
+			precset = list(map(self.reduce,targets))
+			precset = tuple(map(self.stringify,precset))
+		count(f'precsets built: {self.name}')
+		count('precset entries', len(precset))
 		return(precset)
 
 	def stringify(self,prec):
@@ -60,10 +89,23 @@ class LinConstraint:
 
 	def get_precset(self,inp):
 		# given an input, returns the precset (creating it if necessary)
-
-		if inp not in self.precsets:
-			self.precsets[inp] = self.build_precset(inp)
-		return(self.precsets[inp])
+		key = (self.key, inp.fingerprint)
+		return(self.precsets.get(key, lambda: self.build_precset(inp)))
+
+	def compile(self,inp,alphabet):
+		# given an input and a tuple of terminal strings, returns the precset
+		# as a tuple of (preceders, followers) bitmasks over the alphabet.
+		# Terminals outside the alphabet are dropped.
+		key = (self.key, inp.fingerprint, alphabet)
+		return(self.precsets.get(key,
+				lambda: compile_precset(self.get_precset(inp), alphabet)))
+
+	def cached_precset(self,fingerprint):
+		# the precset already built for an input fingerprint, or None
+		key = (self.key, fingerprint)
+		if key not in self.precsets:
+			return(None)
+		return(self.precsets.get(key, None))
 
 	def prec_pairs(self,string):
 		# given a string, yields all pairs (a,b) where a < b
@@ -95,5 +137,99 @@ class LinConstraint:
 		pass
 
 
-
-
+def compile_precset(precset, alphabet):
+	# (preceders, followers) bitmasks for each entry of a precset
+	index = {t: i for i, t in enumerate(alphabet)}
+	mask = lambda terms: sum(1 << index[t] for t in terms if t in index)
+	return(tuple((mask(prec[0]), mask(prec[1])) for prec in precset))
+
+
+def _triggers(columns, alphabet):
+	# columns - (constraint column, compiled precset) pairs
+	triggers = [[] for t in alphabet]
+	for col, compiled in columns:
+		for (preceders, followers) in compiled:
+			if not preceders: continue # can never be violated
+			for i in range(len(alphabet)):
+				if followers >> i & 1:
+					triggers[i].append((col, preceders, followers))
+	return(triggers)
+
+
+def compile_triggers(inp, constraints, alphabet):
+	# Compiles the precsets of several constraints over an alphabet. Returns
+	# one list per terminal of the precsets in which it is a follower, as
+	# (constraint column, preceders, followers).
+	return(_triggers([(col, con.compile(inp, alphabet))
+					  for col, con in enumerate(constraints)], alphabet))
+
+
+def interchangeable(inp, constraints, alphabet):
+	# Partitions the alphabet into classes of terminals that are preceders
+	# and followers of exactly the same (violable) precset entries. Returns
+	# the classes as sorted tuples, in order of their first members.
+	entries = [entry for con in constraints
+			   for entry in con.compile(inp, alphabet) if entry[0]]
+	classes = dict() # signature -> terminals
+	for i, t in enumerate(alphabet):
+		signature = tuple((preceders >> i & 1, followers >> i & 1)
+						  for (preceders, followers) in entries)
+		classes.setdefault(signature, []).append(t)
+	return(tuple(sorted(tuple(sorted(c)) for c in classes.values())))
+
+
+def _score(compile, ncons, candidates):
+	# The scoring kernel; compile(alphabet) gives the triggers.
+	#
+	# Candidates are positions over their own alphabet (usually the same for
+	# every candidate), so the triggers are compiled once per alphabet.
+	kernels = dict()
+	scored = checks = 0 # for instrumentation
+	try:
+		for candidate in candidates:
+			alphabet = tuple(sorted(set(candidate)))
+			if alphabet not in kernels:
+				triggers = compile(alphabet)
+				bits = {t: 1 << i for i, t in enumerate(alphabet)}
+				kernels[alphabet] = ({t: (bits[t], triggers[i])
+									  for i, t in enumerate(alphabet)},
+									 sum(map(len, triggers)))
+			kernel, size = kernels[alphabet]
+
+			vector = [0] * ncons
+			placed = 0
+			for t in candidate:
+				bit, triggered = kernel[t]
+				for (col, preceders, followers) in triggered:
+					if not placed & followers and preceders & ~(placed | bit):
+						vector[col] += 1
+				placed |= bit
+			scored += 1
+			checks += size
+			yield((candidate, tuple(vector)))
+	finally:
+		count('candidates scored', scored)
+		count('precset checks', checks)
+
+
+def score_candidates(inp, constraints, candidates):
+	# Scores a stream of candidates against several constraints in one pass.
+	# Yields (candidate, violation vector) pairs.
+	compile = lambda alphabet: compile_triggers(inp, constraints, alphabet)
+	return(_score(compile, len(constraints), candidates))
+
+
+def score_deltas(added, removed, candidates):
+	# Scores a stream of candidates against changes to the precsets of
+	# several constraints: added and removed are lists with one precset (of
+	# new and dropped entries) per constraint. Yields (candidate, change to
+	# the violation vector) pairs.
+	ncons = len(added)
+	precsets = list(enumerate(added)) + \
+			   [(ncons + col, p) for col, p in enumerate(removed)]
+	compile = lambda alphabet: _triggers(
+				[(col, compile_precset(p, alphabet)) for col, p in precsets],
+				alphabet)
+	for candidate, vector in _score(compile, 2 * ncons, candidates):
+		yield((candidate, tuple(vector[i] - vector[ncons + i]
+								for i in range(ncons))))
@@ -0,0 +1,52 @@
+#! /usr/bin/python
+
+"""
+
+Provides the LRUCache class: a small bounded memo table with statistics,
+shared by the precset and relation caches.
+
+"""
+
+from collections import OrderedDict, namedtuple
+
+
+CacheInfo = namedtuple('CacheInfo',
+					   ['hits', 'misses', 'evictions', 'size', 'maxsize'])
+
+
+class LRUCache:
+
+	def __init__(self, maxsize = 1024):
+		# maxsize - number of entries to keep; least recently used go first
+		self.maxsize = maxsize
+		self.entries = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def get(self, key, build):
+		# Returns the entry for key, calling build() to make it on a miss
+		if key in self.entries:
+			self.hits += 1
+			self.entries.move_to_end(key)
+			return(self.entries[key])
+		self.misses += 1
+		value = build()
+		self.entries[key] = value
+		while len(self.entries) > self.maxsize:
+			self.entries.popitem(last = False)
+			self.evictions += 1
+		return(value)
+
+	def __contains__(self, key):
+		return(key in self.entries)
+
+	def __len__(self):
+		return(len(self.entries))
+
+	def clear(self):
+		self.entries.clear()
+
+	def info(self):
+		return(CacheInfo(self.hits, self.misses, self.evictions,
+						 len(self.entries), self.maxsize))
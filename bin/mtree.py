@@ -15,7 +15,12 @@ restrictions:
 
 """
 
+from collections import deque
 from itertools import product
+import hashlib
+import re
+from bin.relations import Relations
+from bin.instrument import timed, count
 
 
 class TreeError(Exception):
@@ -24,20 +29,22 @@ class TreeError(Exception):
 
 class Node(object):
 
-	def __init__(self,head,child,tree=None):
+	def __init__(self,head,child,tree=None,project=True):
+		# project - if unset, the head's projections are left for the caller
+		# to fill in (MTree does this for all nodes at once)
 		if child and head.word and child.word:
 			# special case for head-movement
 			self.label = (head.label[0],head.label[1])
 		else:
 			self.label = (head.label[0],head.label[1]+1) # project
 
-		self.paths = [(self,)] # paths to root
 		self.projections = [self] # things projected
 		self.mothers = []
 
 		self.head = head # the head Node
 		self.head.add_mother(self) # add the upward edge
-		self.head.add_projection(self) # add the projection
+		if project:
+			self.head.add_projection(self) # add the projection
 
 		self.child = child # the child Node
 		if child: # this might be None
@@ -58,23 +65,20 @@ class Node(object):
 	def add_mother(self,node):
 		# add an additional mother
 		self.mothers.append(node)
-		self.update_paths() # update paths to match
 
 	def add_projection(self,node):
 		self.projections.append(node)
 		if not self.terminal:
 			self.head.add_projection(node) # propagate down
 
-	def update_paths(self):
-		new_paths = []
-		for mom in self.mothers:
-			for path in mom.paths:
-				new_paths.append(path + (self,))
-		self.paths = new_paths
-		# Now, propagate down:
-		for daughter in self.daughters:
-			if daughter: # this might be None
-				daughter.update_paths()
+	@property
+	def paths(self):
+		# All paths from the root to this node. These are built on request
+		# only: their number grows exponentially with remerge, and dominance
+		# and path-command are answered by tree.relations instead.
+		if not self.mothers:
+			return([(self,)])
+		return([path + (self,) for mom in self.mothers for path in mom.paths])
 
 	@property
 	def branching(self):
@@ -86,6 +90,8 @@ class Node(object):
 
 	def dominates(self,target):
 		# target is a node. true if self dominates target.
+		if self.tree is not None:
+			return(self.tree.relations.dominates(self,target))
 		return(bool([p for p in target.paths if self in p]))
 
 	@property
@@ -102,6 +108,8 @@ class Node(object):
 	def path_command(self,target):
 		# True if all paths from the target pass through any projection of this
 		# node.
+		if self.tree is not None:
+			return(self.tree.relations.path_command(self,target))
 		for path in target.paths:
 			if not set(path) & set(self.projections):
 				return(False)
@@ -109,6 +117,8 @@ class Node(object):
 
 	def ccommand(self,target):
 		# c-command: domination by sister
+		if self.tree is not None:
+			return(self.tree.relations.related(self,'ccommand',target))
 		for sis in self.sisters:
 			if sis.dominates(target):
 				return(True)
@@ -116,6 +126,8 @@ class Node(object):
 
 	def tccommand(self,target):
 		# total c-command: path-command by a sister and a mother
+		if self.tree is not None:
+			return(self.tree.relations.related(self,'tccommand',target))
 		if self.dominates(target): return(False)
 		for (sis, mom) in product(self.sisters, self.mothers):
 			if sis.path_command(target) and mom.path_command(target):
@@ -126,6 +138,8 @@ class Node(object):
 		return(self.ccommand(target) and not target.ccommand(self))
 	
 	def asym_tccommand(self,target):
+		if self.tree is not None:
+			return(self.tree.relations.related(self,'asym_tccommand',target))
 		return(self.tccommand(target) and not target.tccommand(self))
 	
 	@property
@@ -144,7 +158,6 @@ class TerminalNode(Node):
 		self.label = (str(name),0)
 		self.head = None
 		self.child = None
-		self.paths = [(self,)]
 		self.projections = [self]
 		self.mothers = []
 		self.terminal = True
@@ -158,12 +171,6 @@ class TerminalNode(Node):
 		# The form of the string: X0 -> x
 		return(self.label[0].lower())
 
-	def update_paths(self):
-		self.paths = []
-		for mom in self.mothers:
-			for path in mom.paths:
-				self.paths.append(path + (self,))
-
 
 
 class MTree(object):
@@ -174,59 +181,89 @@ class MTree(object):
 
 	terminals - list of strings labelling terminal nodes
 	merges - list of tuples (head, child) indicating merges
+	lines - optionally, the line of the tree file each merge is on, for
+		error messages
 	"""
 
-	def __init__(self,terminals,merges,name = None):
+	def __init__(self,terminals,merges,name = None,lines = None):
+		self.name = name
+		self._build(list(terminals),list(merges),lines)
+
+	def _build(self,terminals,merges,lines = None):
+		# Builds the nodes from the terminal labels and the merge list.
+		# Merges are taken in order; one that refers to a node that hasn't
+		# been built yet waits on that label, and is queued again when a node
+		# with the label is built. Each merge is therefore looked at a bounded
+		# number of times. Projections are filled in afterwards, in one sweep
+		# down the head chains.
+		self.merges = list(merges) # kept, for editing
 		self.terminals = [TerminalNode(n, tree = self) for n in terminals]
 		self.nodes = {str(n): n for n in self.terminals}
 		self.root = None
-		self.name = name
-
-		# build it
-
-		roots = list(self.terminals)
-		while merges:
-			cur_merge = merges.pop(0) # get the first one
-
-			# We need to check if we've created both nodes.
-			# And we want to do this in a way that takes advantage of the
-			# alternate naming schemes defined in __getitem__
-			# so "if ___ not in ___" won't cut it.
-			# This is the alternative:
-			try:
-				self[cur_merge[0]] # have we created node 1?
-				if cur_merge[1]: # might be null
-					self[cur_merge[1]] # have we created node 2?
-			except KeyError: # one of them didn't exist
-				if cur_merge[1]: # this might be null
-					# if it's null, we actually can continue, even with the
-					# exception.
-					merges.append(cur_merge)
-					continue # skip this instruction until we've built more
-			
-			# find the head
-			head = self[cur_merge[0]]
-			try: roots.remove(head)
-			except ValueError: pass # wasn't there
-
-			# find the child, if applicable
-			if cur_merge[1]: # this might be None
-				child = self[cur_merge[1]]
-				try: roots.remove(child)
-				except ValueError: pass
-			else: child = None
-
-			# make a new node
-			new_node = Node(head,child,tree = self)
-			# This is a root now:
-			roots.append(new_node)
-			# Make sure we keep track of this node:
+		lines = list(lines) if lines else [None] * len(merges)
+
+		# the highest projection so far of each terminal, for 'XP', and the
+		# terminal at the foot of each node's head chain
+		top = {t: t for t in self.terminals}
+		foot = {t: t for t in self.terminals}
+
+		def find(name):
+			# __getitem__, but None if the node isn't there yet
+			if name in self.nodes:
+				return(self.nodes[name])
+			if len(name) == 1:
+				return(self.nodes.get(name + '0'))
+			if name[-1] == 'P' and name[:-1] + '0' in self.nodes:
+				return(top[self.nodes[name[:-1] + '0']])
+			return(None)
+
+		queue = deque(range(len(merges)))
+		waiting = dict() # label -> merges waiting for it
+		while queue:
+			i = queue.popleft()
+			head_name, child_name = merges[i]
+			head = find(head_name)
+			child = find(child_name) if child_name else None # might be null
+			if head is None:
+				waiting.setdefault(head_name, []).append(i)
+				continue
+			if child_name and child is None:
+				waiting.setdefault(child_name, []).append(i)
+				continue
+
+			new_node = Node(head,child,tree = self,project = False)
+			if str(new_node) in self.nodes:
+				raise TreeError(f"{_where(merges, lines, i)} builds "
+								f"{new_node}, which already exists")
 			self.nodes[str(new_node)] = new_node
+			foot[new_node] = foot[head]
+			top[foot[head]] = new_node
+			queue.extend(waiting.pop(str(new_node), []))
+
+		if waiting:
+			_unresolved(merges, lines, waiting)
+
+		# Projections: a node projects itself and whatever its projectors
+		# (the mothers it heads) do, in the order they were built. Nodes were
+		# built daughters first, so a backwards pass sees every projector
+		# before its head, and a projector's list is already in order.
+		built = {node: i for i, node in enumerate(self.nodes.values())}
+		for node in reversed(list(self.nodes.values())):
+			projectors = list(dict.fromkeys(mom for mom in node.mothers
+											if mom.head is node))
+			if len(projectors) == 1:
+				node.projections = [node] + projectors[0].projections
+			elif projectors: # e.g. a head that also forms a complex head
+				above = {p for mom in projectors for p in mom.projections}
+				node.projections = [node] + sorted(above, key = built.get)
 
 		# Ok, we've built a tree. Check if it has a unique root:
+		roots = [n for n in self.nodes.values() if not n.mothers]
 		if len(roots) > 1:
 			raise TreeError("No unique root:" + str(roots))
 		self.root = roots[0] # ok, we succeeded
+		self._fingerprint = None
+		self._relations = None
 
 	def __getitem__(self,item):
 		# This needs to do slightly more than just get the node:
@@ -257,13 +294,96 @@ class MTree(object):
 	def words(self):
 		yield from [n for n in self.nodes.values() if n.word]
 
+	@property
+	def fingerprint(self):
+		# A structural hash of the tree: two trees with the same terminals and
+		# the same merges (in any order) share a fingerprint, whatever their
+		# names.
+		if self._fingerprint is None:
+			edges = sorted((str(n), str(n.head), str(n.child))
+						   for n in self.nodes.values() if not n.terminal)
+			terminals = sorted(str(t) for t in self.terminals)
+			spec = repr((terminals, edges)).encode()
+			self._fingerprint = hashlib.sha1(spec).hexdigest()
+		return(self._fingerprint)
+
+	@property
+	def relations(self):
+		# The reachability index, built on first use (after construction)
+		if self._relations is None:
+			self._relations = Relations(self)
+		return(self._relations)
+
 	def terminals_dominated(self,node):
 		# returns the terminal nodes dominated by node
-		return([n for n in self.terminals if node.dominates(n)])
+		return(self.relations.terminals_dominated(node))
+
+	def matrix(self,relation):
+		# A bulk relation ('dominates', 'path_command', 'ccommand',
+		# 'tccommand' or 'asym_tccommand') as a list of bit rows, one per
+		# node in self.relations.nodes order: bit j of row i is set iff node i
+		# stands in the relation to node j.
+		return(self.relations.tables.matrix(relation))
+
+	def related(self,node,relation):
+		# the nodes that node stands in a bulk relation to
+		return(self.relations.members(self.relations.row(relation,node)))
 
 	def dominators_of(self,node):
 		# returns the nodes that dominate a given node
-		return([n for n in self.nodes.values() if n.dominates(node)])
+		return(self.relations.dominators(node))
+
+	### editing
+
+	def add_merge(self,head,child = None):
+		"""
+		Adds a merge of child (a node label, or None for a unary merge) into
+		head, and rebuilds the tree. Returns the labels of the nodes whose
+		relations changed (including new and removed nodes).
+		"""
+		return(self._edit(self.merges + [(head,child)]))
+
+	def remove_merge(self,head,child = None):
+		# Removes a merge, as given in the merge list; see add_merge.
+		merges = list(self.merges)
+		try: merges.remove((head,child))
+		except ValueError:
+			raise TreeError(f"No such merge: {head}, {child}")
+		return(self._edit(merges))
+
+	def remerge(self,node,target):
+		# Merges an existing node again, as a specifier of target; see
+		# add_merge.
+		try: self[node]
+		except KeyError:
+			raise TreeError(f"No such node: {node}")
+		return(self.add_merge(target,node))
+
+	def _edit(self,merges):
+		# Rebuilds the tree from a new merge list, and compares the relations
+		# before and after. If the new merges don't make a tree, the old one
+		# is restored and the TreeError raised.
+		before = self._relation_rows()
+		state = (self.merges, self.terminals, self.nodes, self.root,
+				 self._fingerprint, self._relations)
+		try:
+			self._build([t.label[0] for t in self.terminals], merges)
+		except TreeError:
+			(self.merges, self.terminals, self.nodes, self.root,
+			 self._fingerprint, self._relations) = state
+			raise
+		after = self._relation_rows()
+		return({n for n in set(before) | set(after)
+				if before.get(n) != after.get(n)})
+
+	def _relation_rows(self):
+		# {node label: the labels it dominates, path-commands and
+		# total-c-commands}, for comparing trees across edits
+		rel = self.relations
+		return({str(n): tuple(frozenset(map(str, self.related(n, r)))
+							  for r in ('dominates', 'path_command',
+										'tccommand'))
+				for n in rel.nodes})
 
 	### printing
 
@@ -302,6 +422,52 @@ class MTree(object):
 		return(self.bracket_string())
 
 
+def _where(merges, lines, i):
+	# describes a merge for an error message
+	head, child = merges[i]
+	merge = f"{head}, {child}" if child else head
+	if lines[i] is None:
+		return(f"merge '{merge}'")
+	return(f"merge '{merge}' (line {lines[i]})")
+
+
+def _projects_to(name):
+	# The labels a merge headed by name might build: the next projection,
+	# or a complex head if name is a word. Used to explain failures only.
+	match = re.fullmatch(r'(.+?)(\d+)', name)
+	if match:
+		label, level = match.group(1), int(match.group(2))
+		return({label + str(level + 1)} | ({label} if level == 0 else set()))
+	if len(name) == 1:
+		return({name + '1', name})
+	return(set())
+
+
+def _unresolved(merges, lines, waiting):
+	# Raises a TreeError for merges that could never be built: either they
+	# wait on each other in a cycle, or on a label that nothing builds.
+	needs = {i: label for label, idx in waiting.items() for i in idx}
+	builders = dict() # label -> waiting merges that might build it
+	for i in needs:
+		for label in _projects_to(merges[i][0]):
+			builders.setdefault(label, []).append(i)
+
+	for start in sorted(needs):
+		chain = [start]
+		while needs[chain[-1]] in builders:
+			step = builders[needs[chain[-1]]][0]
+			if step in chain:
+				cycle = chain[chain.index(step):]
+				raise TreeError("Merges form a cycle: " +
+								"; ".join(_where(merges, lines, i)
+										  for i in cycle))
+			chain.append(step)
+
+	first = min([i for i in needs if needs[i] not in builders] or needs)
+	raise TreeError(f"Unresolved label '{needs[first]}' in "
+					f"{_where(merges, lines, first)}")
+
+
 def parseTreeFile(fname,name = None):
 	"""
 	Wrapper for parseTreeString; gets it from a file.
@@ -317,6 +483,7 @@ def parseTreeFile(fname,name = None):
 	return(parseTreeString(treestring,name=name))
 
 
+@timed('parse')
 def parseTreeString(string,name=None):
 	"""
 	Takes a string in the following format:
@@ -336,7 +503,8 @@ def parseTreeString(string,name=None):
 	terminals = [t for t in terminals if t] # remove nulls
 
 	merge_list = []
-	for line in treestring:
+	lines = [] # line numbers, for error messages
+	for number, line in enumerate(treestring, 2):
 		line = ''.join(line.split()).split(',') #munge
 		if line == ['']: continue # blank line
 		head = line[0]
@@ -344,5 +512,7 @@ def parseTreeString(string,name=None):
 		except IndexError:
 			child = None
 		merge_list.append((head,child))
+		lines.append(number)
+	count('merges parsed', len(merge_list))
 	
-	return(MTree(terminals,merge_list,name=name))
+	return(MTree(terminals,merge_list,name=name,lines=lines))
@@ -0,0 +1,147 @@
+#! /usr/bin/python
+
+"""
+
+Provides helpers for evaluating tableaux in a pool of worker processes.
+
+Workers are forked where the platform allows it, so constraints and Gens
+(which may hold lambdas) are inherited rather than pickled; only input
+indices go out, and only compact VectorStores of candidates and violation
+vectors come back. Results are always returned in input order.
+
+A single large tableau can also be split: its candidates are partitioned by
+their first terminal, and each worker generates and scores one part. Each
+worker keeps its own precset caches (warmed in the parent before forking).
+
+Finally, a stream of trees (too many to hold at once) can be evaluated in
+batches: each worker builds one tree from its terminals and merges, finds
+its languages, and keeps nothing once it has sent them back.
+
+"""
+
+from itertools import islice
+
+from bin.linconstraint import score_candidates
+from bin.gen import gen_strings
+from bin.store import VectorStore
+from bin.mtree import MTree
+
+
+_job = None # (inputs, constraints, gen, classes or compress) in a worker
+
+
+def _context():
+	import multiprocessing # slow to import, and only needed with -j
+	if 'fork' in multiprocessing.get_all_start_methods():
+		return(multiprocessing.get_context('fork'))
+	return(multiprocessing.get_context())
+
+
+def _init(*job):
+	global _job
+	_job = job
+
+
+def _score_input(i):
+	# Scores every candidate for one input; returns a VectorStore
+	inputs, constraints, gen, compress = _job
+	classes = gen.classes(inputs[i], constraints) if compress else None
+	return(VectorStore(len(constraints),
+					   score_candidates(inputs[i], constraints,
+										gen(inputs[i], classes = classes))))
+
+
+def score_inputs(inputs, constraints, gen, workers, compress = False):
+	# Scores the candidates of every input in a pool of worker processes.
+	# Returns one VectorStore per input, in input order. With compress, the
+	# candidates are one per arrangement of interchangeable terminals.
+	inputs = tuple(inputs)
+	if not inputs:
+		return([])
+	with _context().Pool(workers, _init, (inputs, tuple(constraints), gen,
+										  compress)) as pool:
+		return(pool.map(_score_input, range(len(inputs))))
+
+
+def _score_chunk(chunk):
+	# Scores one part of a single input's candidates. chunk is either a first
+	# terminal (the worker generates the candidates itself) or a list of
+	# candidates.
+	inp, constraints, gen, classes = _job
+	if isinstance(chunk, str):
+		candidates = gen_strings(inp, null_phon = gen.null_phon or {},
+								 first = chunk, classes = classes)
+	else:
+		candidates = chunk
+	return(VectorStore(len(constraints),
+					   score_candidates(inp, constraints, candidates),
+					   alphabet = _alphabet(inp, gen)))
+
+
+def _alphabet(inp, gen):
+	# the pronounced terminals, so that every part encodes them alike
+	null_phon = {t.lower() for t in gen.null_phon or {}}
+	return(sorted({t.s for t in inp.terminals} - null_phon))
+
+
+def score_chunks(inp, constraints, gen, workers, classes = None):
+	# Scores the candidates of a single input in a pool of worker processes,
+	# split by first terminal. Returns a VectorStore, in the order gen would
+	# produce the candidates (with the classes, if given).
+	constraints = tuple(constraints)
+	for con in constraints:
+		con.get_precset(inp) # warm the caches the workers inherit
+	if gen.function is gen_strings and classes is not None:
+		chunks = [c[0] for c in classes] # orders start with a first member
+	elif gen.function is gen_strings:
+		chunks = _alphabet(inp, gen)
+	else:
+		# an arbitrary Gen: generate here and hand out the parts
+		parts = dict()
+		for candidate in gen(inp):
+			parts.setdefault(candidate[:1], []).append(candidate)
+		chunks = list(parts.values())
+
+	store = VectorStore(len(constraints))
+	with _context().Pool(workers, _init, (inp, constraints, gen,
+										  classes)) as pool:
+		for part in pool.imap(_score_chunk, chunks):
+			store.extend(part)
+	return(store)
+
+
+def tree_languages(spec, constraints, gen):
+	# The languages of the one-input typology of a tree, given as (terminals,
+	# merges, name)
+	from bin.tableau import Typology # tableau imports this module
+	terminals, merges, name = spec
+	tree = MTree(terminals, merges, name = name)
+	return(Typology([tree], constraints, gen = gen).languages)
+
+
+def _tree_job(spec):
+	return(tree_languages(spec, *_job))
+
+
+def _init_trees(constraints, gen):
+	global _job
+	_job = (constraints, gen)
+
+
+def evaluate_trees(specs, constraints, gen, workers, batch = 256):
+	# Yields the languages of each of a stream of trees, given as (terminals,
+	# merges, name), in order. The stream is consumed batch by batch, so only
+	# a batch of trees and results is held at a time.
+	specs = iter(specs)
+	constraints = tuple(constraints)
+	if workers <= 1:
+		for spec in specs:
+			yield(tree_languages(spec, constraints, gen))
+		return
+	with _context().Pool(workers, _init_trees, (constraints, gen)) as pool:
+		while True:
+			chunk = list(islice(specs, batch * workers))
+			if not chunk:
+				break
+			yield from pool.imap(_tree_job, chunk,
+								 chunksize = max(1, batch // 8))
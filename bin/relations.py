@@ -0,0 +1,261 @@
+#! /usr/bin/python
+
+"""
+
+Provides the Relations class: a reachability index over the nodes of an MTree.
+
+Every node is given a bit position, and dominance is stored as one int per
+node in each direction (the nodes it dominates, the nodes that dominate it),
+computed in a single bottom-up and a single top-down sweep over the DAG.
+Dominance queries are then bit tests rather than scans over paths.
+
+X path-commands Y iff the projections of X cut every root-to-Y path. This is
+answered from the dominator tree of the DAG (in the graph-theoretic sense: D
+dominates Y if every root-to-Y path passes through D), which is built in one
+top-down sweep:
+	- if some projection of X is a graph dominator of Y, X path-commands Y;
+	- if no projection of X is an ancestor of Y, no path to Y meets them;
+	- otherwise the projections can only cut the paths jointly, and we fall
+	  back to a per-node "cut" mask (one top-down sweep, computed on demand
+	  and kept). This only happens under multidominance.
+None of this needs the paths themselves.
+
+The c-command relations are also available in bulk, as bit matrices (one row
+per node) computed from the dominance and path-command rows in a few passes:
+	- dominates: reflexive dominance
+	- path_command
+	- ccommand: dominated by a sister
+	- tccommand: path-commanded by a sister and a mother, and not dominated
+	- asym_tccommand: tccommand, minus the transposed matrix
+Constraints read rows of these rather than testing node pairs one by one.
+
+Bit positions follow a canonical order (by height, then label), so the tables
+depend only on the structure of the tree. They are kept in RelationTables,
+which are shared through `relation_cache` by every MTree with the same
+fingerprint; a Relations object just maps its own nodes onto them.
+
+"""
+
+from bin.lru import LRUCache
+from bin.instrument import stage
+
+
+relation_cache = LRUCache(maxsize = 256) # fingerprint -> RelationTables
+
+
+class RelationTables:
+	"""
+	The structural part of a Relations index: ints indexed by canonical node
+	position, with no reference to Node objects.
+	"""
+
+	def __init__(self, daughters, mothers, projections, terminals):
+		# daughters, mothers - lists of node positions, per node; daughters
+		#	always come before their mothers
+		# projections - per node, the bitmask of its projections
+		# terminals - the positions of the terminal nodes
+		n = len(daughters)
+		self.daughters = daughters
+		self.mothers = mothers
+		self.projections = projections
+
+		# Reflexive dominance, bottom-up and top-down
+		self.desc = [0] * n
+		for i in range(n):
+			mask = 1 << i
+			for d in daughters[i]:
+				mask |= self.desc[d]
+			self.desc[i] = mask
+		self.anc = [0] * n
+		for i in reversed(range(n)):
+			mask = 1 << i
+			for m in mothers[i]:
+				mask |= self.anc[m]
+			self.anc[i] = mask
+
+		# The dominator tree: for a DAG, the immediate dominator of a node is
+		# the nearest common dominator of its mothers, so one top-down sweep
+		# suffices. graph_dom[i] is the (reflexive) set of graph dominators.
+		self.idom = [None] * n
+		self.depth = [0] * n
+		self.graph_dom = [0] * n
+		for i in reversed(range(n)):
+			if mothers[i]:
+				idom = mothers[i][0]
+				for m in mothers[i][1:]:
+					idom = self._intersect(idom, m)
+				self.idom[i] = idom
+				self.depth[i] = self.depth[idom] + 1
+				self.graph_dom[i] = self.graph_dom[idom] | 1 << i
+			else:
+				self.graph_dom[i] = 1 << i
+
+		self.terminal_mask = sum(1 << t for t in terminals)
+		self.multidominated = sum(1 << i for i in range(n)
+								  if len(mothers[i]) > 1)
+		self._cut = dict() # node position -> path-command mask
+		self._matrices = dict() # relation name -> rows
+
+	def _intersect(self, a, b):
+		# nearest common ancestor of a and b in the dominator tree
+		while a != b:
+			if self.depth[a] < self.depth[b]:
+				a, b = b, a
+			a = self.idom[a]
+		return(a)
+
+	def cut(self, i):
+		# The nodes path-commanded by node i: those all of whose paths from
+		# the root pass through one of its projections.
+		if i not in self._cut:
+			projections = self.projections[i]
+			mask = 0
+			for j in reversed(range(len(self.mothers))): # top-down
+				if projections >> j & 1:
+					mask |= 1 << j
+				elif self.mothers[j] and all(mask >> m & 1
+											 for m in self.mothers[j]):
+					mask |= 1 << j
+			self._cut[i] = mask
+		return(self._cut[i])
+
+	def matrix(self, name):
+		# The rows of a relation, built on first use: bit j of row i is set
+		# iff node i stands in the relation to node j.
+		if name not in self._matrices:
+			self._matrices[name] = getattr(self, '_' + name)()
+		return(self._matrices[name])
+
+	def _dominates(self):
+		return(self.desc)
+
+	def _path_command(self):
+		# Everything a projection dominates in the dominator tree; where the
+		# projections dominate remerged nodes they may also cut paths jointly,
+		# and we use the exact cut mask instead.
+		subtree = transpose(self.graph_dom)
+		rows = []
+		for i, projections in enumerate(self.projections):
+			row = 0
+			for p in bits(projections):
+				row |= subtree[p]
+			below = 0
+			for p in bits(projections):
+				below |= self.desc[p]
+			if below & self.multidominated:
+				row = self.cut(i)
+			rows.append(row)
+		return(rows)
+
+	def sisters(self, i):
+		return([d for m in self.mothers[i] for d in self.daughters[m] if d != i])
+
+	def _ccommand(self):
+		rows = []
+		for i in range(len(self.mothers)):
+			row = 0
+			for s in self.sisters(i):
+				row |= self.desc[s]
+			rows.append(row)
+		return(rows)
+
+	def _tccommand(self):
+		pc = self.matrix('path_command')
+		rows = []
+		for i in range(len(self.mothers)):
+			row = 0
+			for s in self.sisters(i):
+				for m in self.mothers[i]:
+					row |= pc[s] & pc[m]
+			rows.append(row & ~self.desc[i])
+		return(rows)
+
+	def _asym_tccommand(self):
+		tc = self.matrix('tccommand')
+		return([row & ~col for row, col in zip(tc, transpose(tc))])
+
+	def path_command(self, i, j):
+		projections = self.projections[i]
+		if self.graph_dom[j] & projections:
+			return(True) # a single projection cuts every path
+		if not self.anc[j] & projections:
+			return(False) # no path meets a projection
+		return(bool(self.cut(i) >> j & 1))
+
+
+def bits(mask):
+	# the positions of the set bits in a mask, lowest first
+	while mask:
+		low = mask & -mask
+		yield(low.bit_length() - 1)
+		mask ^= low
+
+
+def transpose(rows):
+	columns = [0] * len(rows)
+	for i, row in enumerate(rows):
+		for j in bits(row):
+			columns[j] |= 1 << i
+	return(columns)
+
+
+def canonical_order(tree):
+	# The tree's nodes sorted by height, then label: daughters come before
+	# their mothers, and the order depends only on the structure.
+	height = dict()
+	for node in tree.nodes.values(): # creation order: daughters first
+		height[node] = 1 + max([height[d] for d in (node.head, node.child)
+								if d] or [-1])
+	return(sorted(tree.nodes.values(), key = lambda n: (height[n], str(n))))
+
+
+class Relations:
+	def __init__(self, tree):
+		self.nodes = canonical_order(tree)
+		self.index = {node: i for i, node in enumerate(self.nodes)}
+		self.root = tree.root
+		self.tables = relation_cache.get(tree.fingerprint, self._build_tables)
+		self._terminals = dict() # node position -> terminals dominated
+
+	def _build_tables(self):
+		index = self.index
+		with stage('relations'):
+			return(RelationTables(
+				[[index[d] for d in (n.head, n.child) if d] for n in self.nodes],
+				[[index[m] for m in n.mothers] for n in self.nodes],
+				[self.mask(n.projections) for n in self.nodes],
+				[i for i, n in enumerate(self.nodes) if n.terminal]))
+
+	def mask(self, nodes):
+		return(sum(1 << self.index[n] for n in nodes))
+
+	def members(self, mask):
+		# the nodes in a mask, in canonical order
+		return([n for i, n in enumerate(self.nodes) if mask >> i & 1])
+
+	def dominates(self, node, target):
+		return(bool(self.tables.desc[self.index[node]] >> self.index[target] & 1))
+
+	def terminals_dominated(self, node):
+		i = self.index[node]
+		if i not in self._terminals:
+			mask = self.tables.desc[i] & self.tables.terminal_mask
+			self._terminals[i] = self.members(mask)
+		return(self._terminals[i])
+
+	def dominators(self, node):
+		# reflexive, like dominates
+		return(self.members(self.tables.anc[self.index[node]]))
+
+	def cut(self, node):
+		return(self.tables.cut(self.index[node]))
+
+	def row(self, relation, node):
+		# the bitmask of nodes that node stands in the relation to
+		return(self.tables.matrix(relation)[self.index[node]])
+
+	def related(self, node, relation, target):
+		return(bool(self.row(relation, node) >> self.index[target] & 1))
+
+	def path_command(self, node, target):
+		return(self.tables.path_command(self.index[node], self.index[target]))
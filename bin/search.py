@@ -0,0 +1,203 @@
+#! /usr/bin/python
+
+"""
+
+Provides the Search class, a branch-and-bound alternative to scoring every
+permutation produced by Gen.
+
+A Search builds output orders one position at a time. Whether a precset is
+violated is decided at the moment the first of its followers is placed: the
+precset is violated iff some of its preceders are still unplaced. The
+violations of a partial order are therefore a lower bound on the violations
+of every completion, and a partial order can be dropped as soon as some
+complete candidate is known to beat all of its completions.
+
+Without a ranking, partial orders harmonically bounded by a complete
+candidate are dropped, and the surviving candidates are reduced to the
+contenders; with a ranking, partial orders that are already worse than the
+best complete candidate under that ranking are dropped.
+
+For a single ranking, solve() finds the winners exactly by dynamic
+programming over sets of placed terminals instead. Since the violations
+incurred by placing a terminal depend only on which terminals are already
+placed, the best completion of each set is found from the best
+completions of the sets one larger, in O(2^n * n) steps for n terminals
+rather than n!.
+Vectors are compared as single integers: each constraint's violations are
+weighted by one more than the most that all lower-ranked constraints can
+incur together, so that integer order is the ranking's lexicographic order.
+
+"""
+
+from bin.linconstraint import compile_triggers
+from bin.erc import optimizable, bounds
+from bin.instrument import stage, count
+
+
+class Search:
+	def __init__(self, inp, constraints, null_phon = {}):
+		self.input = inp
+		self.constraints = tuple(constraints)
+		null_phon = {t.lower() for t in null_phon}
+		self.alphabet = sorted({t.s for t in inp.terminals} - null_phon)
+
+		# For each terminal, the precsets it is a follower in
+		self._triggers = compile_triggers(inp, self.constraints,
+										  tuple(self.alphabet))
+
+		self._contenders = None
+
+	def _expand(self, prune):
+		# Depth-first construction of orders. prune(vector) is consulted for
+		# every partial order; pruned orders are not extended. Yields
+		# (candidate, vector) for every complete order that survives.
+		n = len(self.alphabet)
+		full = (1 << n) - 1
+
+		def _recurse(placed, order, vector):
+			if placed == full:
+				yield((''.join(order), vector))
+				return
+			for i in range(n):
+				bit = 1 << i
+				if placed & bit: continue
+				new = list(vector)
+				for (col, preceders, followers) in self._triggers[i]:
+					# first follower placed while a preceder is outstanding
+					if not placed & followers and preceders & ~(placed | bit):
+						new[col] += 1
+				new = tuple(new)
+				if prune(new): continue
+				order.append(self.alphabet[i])
+				yield from _recurse(placed | bit, order, new)
+				order.pop()
+
+		yield from _recurse(0, [], (0,) * len(self.constraints))
+
+	def _find_contenders(self):
+		# Keep a pool of complete candidates that are not harmonically bounded
+		# by any other complete candidate found so far.
+		pool = dict() # vector -> candidates
+		prune = lambda v: any(bounds(w, v) for w in pool)
+		for candidate, vector in self._expand(prune):
+			for w in [w for w in pool if bounds(vector, w)]:
+				del pool[w]
+			pool.setdefault(vector, []).append(candidate)
+
+		# Reduce the pool to the vectors that win under some ranking.
+		return({v: tuple(pool[v]) for v in pool if optimizable(v, pool)})
+
+	@property
+	def vectors(self):
+		# {candidate: vector} for the contenders only
+		if self._contenders is None:
+			self._contenders = self._find_contenders()
+		return({c: v for v in self._contenders for c in self._contenders[v]})
+
+	@property
+	def contenders(self):
+		return(set(self.vectors))
+
+	def get_winners(self, ranking):
+		# expects the constraints ranked in some order
+		order = [self.constraints.index(con) for con in ranking]
+		key = lambda v: tuple(v[i] for i in order)
+
+		best = {'key': None, 'winners': []}
+		prune = lambda v: best['key'] is not None and key(v) > best['key']
+		for candidate, vector in self._expand(prune):
+			if best['key'] is None or key(vector) < best['key']:
+				best['key'], best['winners'] = key(vector), []
+			best['winners'].append(candidate)
+		return(tuple(best['winners']))
+
+
+def solve(inp, ranking, null_phon = {}, limit = None):
+	"""
+	The optimal linearizations of an input under a ranking (its constraints,
+	highest first). Returns (winners, vector): the winning orders, sorted,
+	and their violations, in the order of the ranking.
+
+	null_phon - silent terminals, left out of the orders
+	limit - the most winners to return (ties can be numerous when few
+		constraints are violable); all of them by default
+	"""
+	ranking = tuple(ranking)
+	null_phon = {t.lower() for t in null_phon}
+	alphabet = tuple(sorted({t.s for t in inp.terminals} - null_phon))
+	n = len(alphabet)
+	full = (1 << n) - 1
+
+	# weights: a precset entry is violated at most once, so a constraint
+	# can incur at most as many violations as it has (violable) entries
+	weights = [0] * len(ranking)
+	weight = 1
+	for col in reversed(range(len(ranking))):
+		weights[col] = weight
+		weight *= 1 + sum(1 for (preceders, followers)
+						  in ranking[col].compile(inp, alphabet) if preceders)
+	# For each terminal, the precsets it is a follower in, as (weight,
+	# preceders other than itself, followers); entries alike are merged
+	triggers = []
+	for i, triggered in enumerate(compile_triggers(inp, ranking, alphabet)):
+		merged = dict()
+		for (col, preceders, followers) in triggered:
+			key = (preceders & ~(1 << i), followers)
+			merged[key] = merged.get(key, 0) + weights[col]
+		triggers.append(tuple((weight, preceders, followers)
+							  for (preceders, followers), weight
+							  in merged.items()))
+
+	def cost(placed, i):
+		# the weighted violations of placing terminal i after those placed
+		total = 0
+		for (weight, preceders, followers) in triggers[i]:
+			if not placed & followers and preceders & ~placed:
+				total += weight
+		return(total)
+
+	with stage('solve', terminals = n):
+		# best[s] - the least weighted violations of completing an order of
+		# the set s; filled from the full set down
+		best = [0] * (full + 1)
+		for placed in reversed(range(full)):
+			least = None
+			rest = full & ~placed
+			while rest:
+				bit = rest & -rest
+				rest ^= bit
+				new = best[placed | bit] # + cost(placed, i), inlined
+				for (weight, preceders, followers) in \
+						triggers[bit.bit_length() - 1]:
+					if not placed & followers and preceders & ~placed:
+						new += weight
+				if least is None or new < least:
+					least = new
+			best[placed] = least
+		count('subsets solved', full + 1)
+
+		# Read the winners off from the empty set: placing i next is optimal
+		# iff its cost plus the best completion after it is the best. Trying
+		# the terminals in order gives the winners in order.
+		winners = []
+		def _follow(placed, order):
+			if limit is not None and len(winners) >= limit:
+				return
+			if placed == full:
+				winners.append(''.join(order))
+				return
+			for i in range(n):
+				bit = 1 << i
+				if placed & bit: continue
+				if cost(placed, i) + best[placed | bit] == best[placed]:
+					order.append(alphabet[i])
+					_follow(placed | bit, order)
+					order.pop()
+		_follow(0, [])
+
+	vector = []
+	total = best[0]
+	for weight in weights:
+		vector.append(total // weight)
+		total %= weight
+	return((tuple(winners), tuple(vector)))
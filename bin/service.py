@@ -0,0 +1,150 @@
+#! /usr/bin/python
+
+"""
+
+Provides the evaluation service behind `otlinearize.py serve`: a small JSON
+HTTP server on localhost that keeps trees, precsets and tableaux warm between
+requests.
+
+Endpoints (all JSON):
+
+	POST /tableau	{"tree": tree text, "name": optional name,
+					 "constraints": optional specs, "alpha": optional alpha
+					 for the default constraints, "null_phon": optional
+					 silent terminals, "all": include bounded candidates}
+					-> Tableau.to_json()
+	POST /typology	{"trees": [tree text, ...], "names": optional names,
+					 "constraints", "alpha", "null_phon" as above}
+					-> Typology.to_json()
+	GET /stats		cache statistics
+
+Constraint specs are as for con.build_constraints; without them, the default
+set is used. Errors come back as {"error": message} with status 400.
+
+An Evaluator (see bin.evaluator) holds the warm state between requests.
+Requests are served concurrently, and evaluated on a pool of workers: with
+one worker, an Evaluator in the server process, one request at a time; with
+several, forked processes that each keep their own Evaluator warm.
+
+"""
+
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import json
+import multiprocessing
+
+from bin.evaluator import Evaluator, RequestError
+
+
+_evaluator = None # the Evaluator of a worker process
+
+
+def _init_worker(cache):
+	global _evaluator
+	_evaluator = Evaluator(cache)
+
+
+def _work(kind, request):
+	# runs in a worker; errors are returned rather than raised, so they
+	# needn't be pickled as exceptions
+	try:
+		return((True, _evaluator.handle(kind, request)))
+	except RequestError as e:
+		return((False, str(e)))
+
+
+def _stats():
+	return(_evaluator.stats())
+
+
+class Service:
+	"""
+	Evaluates requests on a pool of `workers`, each with a warm Evaluator.
+
+	Service(workers = 1, cache = None)
+
+	cache - optionally, a ResultCache directory (each worker connects to it
+		separately)
+	"""
+
+	def __init__(self, workers = 1, cache = None):
+		global _evaluator
+		if workers > 1:
+			if 'fork' in multiprocessing.get_all_start_methods():
+				context = multiprocessing.get_context('fork')
+			else:
+				context = multiprocessing.get_context()
+			self.pool = ProcessPoolExecutor(workers, mp_context = context,
+											initializer = _init_worker,
+											initargs = (cache,))
+		else:
+			# one thread, so the Evaluator is never used concurrently
+			_evaluator = Evaluator(cache)
+			self.pool = ThreadPoolExecutor(1)
+
+	def handle(self, kind, request):
+		# returns the response, or raises RequestError
+		ok, response = self.pool.submit(_work, kind, request).result()
+		if not ok:
+			raise RequestError(response)
+		return(response)
+
+	def stats(self):
+		return(self.pool.submit(_stats).result())
+
+	def close(self):
+		self.pool.shutdown()
+
+
+class Handler(BaseHTTPRequestHandler):
+	# self.server.service is the Service
+
+	def _reply(self, status, body):
+		data = json.dumps(body).encode()
+		self.send_response(status)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(data)))
+		self.end_headers()
+		self.wfile.write(data)
+
+	def do_GET(self):
+		if self.path == '/stats':
+			self._reply(200, self.server.service.stats())
+		else:
+			self._reply(404, {'error': f"No such endpoint: {self.path}"})
+
+	def do_POST(self):
+		kind = self.path.strip('/')
+		if kind not in ('tableau', 'typology'):
+			self._reply(404, {'error': f"No such endpoint: {self.path}"})
+			return
+		try:
+			length = int(self.headers.get('Content-Length', 0))
+			request = json.loads(self.rfile.read(length) or b'{}')
+			self._reply(200, self.server.service.handle(kind, request))
+		except (ValueError, RequestError) as e:
+			self._reply(400, {'error': str(e)})
+		except Exception as e:
+			self._reply(500, {'error': f"{type(e).__name__}: {e}"})
+
+	def log_message(self, format, *args):
+		pass # quiet; the front end does its own logging
+
+
+def serve(port = 8765, workers = 1, cache = None, ready = None):
+	"""
+	Serves on localhost until interrupted. ready, if given, is called with
+	the server once it is listening (port 0 picks a free port).
+	"""
+	service = Service(workers, cache)
+	server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+	server.service = service
+	if ready:
+		ready(server)
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.server_close()
+		service.close()
@@ -0,0 +1,172 @@
+#! /usr/bin/python
+
+"""
+
+Provides the VectorStore class: a compact, array-backed map from candidate
+strings to violation vectors, used by Tableau.
+
+Candidates are packed into one bytearray, one byte per terminal (as a code
+into the store's alphabet), and violations into one flat array of unsigned
+shorts. The inverse index groups row numbers by unique vector. A candidate
+thus costs its length plus two bytes per constraint plus a four-byte row
+number, instead of a string, a tuple of ints, and their dict entries.
+
+All candidates in a store must have the same length (they are orders of the
+same terminals). Looking a candidate up by string scans the packed rows,
+which is fast for the handful of lookups that printing needs; iterate with
+items() to visit everything.
+
+"""
+
+from array import array
+from collections.abc import Mapping
+
+
+class VectorStore(Mapping):
+
+	def __init__(self, ncons, pairs = (), alphabet = ()):
+		# ncons - number of constraints, i.e. the length of every vector
+		# pairs - optionally, (candidate, vector) pairs to add
+		# alphabet - optionally, the terminal strings to assign codes to first
+		self.ncons = ncons
+		self.alphabet = list(alphabet) # code -> terminal string
+		self.codes = {t: i for i, t in enumerate(self.alphabet)}
+		self.width = None # length of every candidate
+		self.candidates = bytearray()
+		self.violations = array('H')
+		self.groups = dict() # vector -> array of row numbers
+		for candidate, vector in pairs:
+			self.append(candidate, vector)
+
+	def _encode(self, candidate):
+		for t in candidate:
+			if t not in self.codes:
+				if len(self.alphabet) == 256:
+					raise ValueError('VectorStore holds at most 256 terminals')
+				self.codes[t] = len(self.alphabet)
+				self.alphabet.append(t)
+		return(bytes(self.codes[t] for t in candidate))
+
+	def _decode(self, row):
+		start = row * self.width
+		return(''.join([self.alphabet[b]
+						for b in self.candidates[start:start + self.width]]))
+
+	def vector(self, row):
+		start = row * self.ncons
+		return(tuple(self.violations[start:start + self.ncons]))
+
+	def append(self, candidate, vector):
+		# Adds a candidate; candidates are assumed to be distinct.
+		if self.width is None:
+			self.width = len(candidate)
+		elif len(candidate) != self.width:
+			raise ValueError('Candidates in a VectorStore must have one length')
+		row = len(self)
+		self.candidates += self._encode(candidate)
+		self.violations.extend(vector)
+		self.groups.setdefault(tuple(vector), array('I')).append(row)
+
+	def extend(self, other):
+		# Appends every candidate of another store
+		if not len(self):
+			self.alphabet = list(other.alphabet)
+			self.codes = dict(other.codes)
+		if other.alphabet != self.alphabet or self.width not in (None, other.width):
+			for candidate, vector in other.items():
+				self.append(candidate, vector)
+			return
+		offset = len(self)
+		self.width = other.width
+		self.candidates += other.candidates
+		self.violations.extend(other.violations)
+		for vector, rows in other.groups.items():
+			self.groups.setdefault(vector, array('I')).extend(
+										row + offset for row in rows)
+
+	def adjust(self, deltas):
+		# Adds a change vector to each row in turn (deltas is an iterable
+		# with one per row, in order), and regroups the rows.
+		for row, delta in enumerate(deltas):
+			if any(delta):
+				start = row * self.ncons
+				for i, d in enumerate(delta, start):
+					self.violations[i] += d
+		self._regroup()
+
+	def add_column(self, values):
+		# Appends a constraint: values has one violation count per row
+		old, n = self.violations, self.ncons
+		self.violations = array('H')
+		for row, value in enumerate(values):
+			self.violations.extend(old[row * n:(row + 1) * n])
+			self.violations.append(value)
+		self.ncons += 1
+		self._regroup()
+
+	def remove_column(self, col):
+		# Drops a constraint's violations from every row
+		old, n = self.violations, self.ncons
+		self.violations = array('H', (v for i, v in enumerate(old)
+									  if i % n != col))
+		self.ncons -= 1
+		self._regroup()
+
+	def _regroup(self):
+		groups = dict()
+		for row in range(len(self)):
+			groups.setdefault(self.vector(row), array('I')).append(row)
+		self.groups = groups
+
+	def row(self, candidate):
+		# The row number of a candidate; KeyError if it isn't stored
+		if self.width is None or len(candidate) != self.width:
+			raise KeyError(candidate)
+		if self.width == 0:
+			return(0) # the one empty candidate
+		try:
+			key = bytes(self.codes[t] for t in candidate)
+		except KeyError:
+			raise KeyError(candidate)
+		start = self.candidates.find(key)
+		while start != -1:
+			if start % self.width == 0:
+				return(start // self.width)
+			start = self.candidates.find(key, start + 1)
+		raise KeyError(candidate)
+
+	def __getitem__(self, candidate):
+		return(self.vector(self.row(candidate)))
+
+	def __iter__(self):
+		for row in range(len(self)):
+			yield self._decode(row)
+
+	def __len__(self):
+		if not self.width:
+			return(len(self.violations) // self.ncons if self.ncons else 0)
+		return(len(self.candidates) // self.width)
+
+	def items(self):
+		for row in range(len(self)):
+			yield((self._decode(row), self.vector(row)))
+
+	@property
+	def inverse(self):
+		# {vector: [candidates]}, decoded on access
+		return(InverseView(self))
+
+
+class InverseView(Mapping):
+
+	def __init__(self, store):
+		self.store = store
+
+	def __getitem__(self, vector):
+		return([self.store._decode(row) for row in self.store.groups[vector]])
+
+	def __iter__(self):
+		yield from self.store.groups
+
+	def __len__(self):
+		return(len(self.store.groups))
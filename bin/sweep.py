@@ -0,0 +1,144 @@
+#! /usr/bin/python
+
+"""
+
+Provides tools for sweeping a whole space of trees: every structure over a
+set of terminals, up to a number of movements, evaluated one by one.
+
+Structures are built phrase by phrase. A phrase of head X takes a complement
+phrase (built from some of the remaining terminals) or, lacking one, projects
+alone; then it takes specifiers one at a time, each either a new phrase
+(external merge) or a phrase already inside it (internal merge, i.e.
+phrasal movement, which remerges a node and so makes the tree multidominant).
+Every terminal is used exactly once, and at most `moves` internal merges are
+made in the whole tree. Head movement is not generated.
+
+Different derivations may build the same structure; trees are deduplicated
+by a canonical hash, either the tree's fingerprint (labelled structure) or,
+with labels = False, its shape with the terminals' labels ignored.
+
+sweep() streams the trees through a worker pool and yields each with its
+languages (as in Typology.languages), so no tableau outlives its tree.
+
+"""
+
+from collections import deque
+from itertools import combinations
+import hashlib
+
+from bin.mtree import MTree
+from bin.gen import Gen
+from bin.parallel import evaluate_trees
+
+
+def _subsets(items):
+	# every subset of a frozenset, smallest first
+	items = sorted(items)
+	for size in range(len(items) + 1):
+		for subset in combinations(items, size):
+			yield(frozenset(subset))
+
+
+def _phrases(head, others, moves):
+	# Yields (merges, top label, phrases inside, moves used) for every phrase
+	# of head over exactly the terminals in others.
+	for comp in _subsets(others):
+		if not comp:
+			bases = [([(head + '0', None)], [], 0)]
+		else:
+			bases = [(merges + [(head + '0', top)], inside + [top], used)
+					 for c in sorted(comp)
+					 for merges, top, inside, used
+					 in _phrases(c, comp - {c}, moves)]
+		for merges, inside, used in bases:
+			yield from _specifiers(head, 1, others - comp, merges, inside,
+								   used, moves)
+
+
+def _specifiers(head, level, rest, merges, inside, used, moves):
+	# Extends the phrase of head, currently at projection level, by zero or
+	# more specifiers; rest are the terminals still to be used.
+	top = head + str(level)
+	if not rest:
+		yield((merges, top, inside, used))
+	for spec in _subsets(rest):
+		if not spec: continue
+		for s in sorted(spec):
+			for smerges, stop, sinside, sused in _phrases(s, spec - {s},
+														  moves - used):
+				yield from _specifiers(head, level + 1, rest - spec,
+									   merges + smerges + [(top, stop)],
+									   inside + sinside + [stop],
+									   used + sused, moves)
+	if used < moves:
+		for phrase in inside:
+			yield from _specifiers(head, level + 1, rest,
+								   merges + [(top, phrase)], inside,
+								   used + 1, moves)
+
+
+def structures(terminals, moves = 0):
+	# Yields the merge list of every derivation over the terminals (labels
+	# of single characters, or at least not ending in digits)
+	terminals = frozenset(terminals)
+	for root in sorted(terminals):
+		for merges, _, _, _ in _phrases(root, terminals - {root}, moves):
+			yield(merges)
+
+
+def canonical_hash(tree, labels = True):
+	# A hash shared by exactly the isomorphic trees. With labels, isomorphism
+	# respects terminal labels, and this is the fingerprint; otherwise nodes
+	# are numbered in a walk from the root (head before child, which is
+	# canonical since the two are distinguished) and the shape is hashed.
+	if labels:
+		return(tree.fingerprint)
+	number = dict()
+	shape = []
+	def visit(node):
+		if node not in number:
+			if node.terminal:
+				shape.append(None)
+			else:
+				shape.append((visit(node.head),
+							  visit(node.child) if node.child else None))
+			number[node] = len(number)
+		return(number[node])
+	visit(tree.root)
+	return(hashlib.sha1(repr(shape).encode()).hexdigest())
+
+
+def trees(terminals, moves = 0, labels = True):
+	"""
+	Yields every structure over the terminals with at most `moves` phrasal
+	movements, as MTrees named T1, T2, ..., once per canonical hash.
+	"""
+	terminals = sorted(terminals)
+	seen = set()
+	for merges in structures(terminals, moves):
+		tree = MTree(terminals, merges)
+		key = canonical_hash(tree, labels)
+		if key in seen:
+			continue
+		seen.add(key)
+		tree.name = f"T{len(seen)}"
+		yield(tree)
+
+
+def sweep(terminals, constraints, moves = 0, gen = None, workers = 1,
+		  labels = True):
+	"""
+	Evaluates every tree from trees(terminals, moves, labels) against the
+	constraints, in a pool of `workers` processes. Yields (tree, languages)
+	pairs, in order, where languages maps each language of the tree's
+	one-input typology to its ERCs.
+	"""
+	gen = gen if gen is not None else Gen(maxsize = 0) # every tree differs
+	pending = deque() # trees sent out, awaiting their languages
+	def specs():
+		for tree in trees(terminals, moves, labels):
+			pending.append(tree)
+			yield(([t.label[0] for t in tree.terminals], tree.merges,
+				   tree.name))
+	for languages in evaluate_trees(specs(), constraints, gen, workers):
+		yield((pending.popleft(), languages))
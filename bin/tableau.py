@@ -4,85 +4,289 @@
 
 Provides the Tableau class. A tableau takes an input, a iterable of
 Constraints, and (optionally) a Gen with a custom function; it calculates all
-the violation vectors and stores them in a bidirectional dictionary, then
-identifies the winners based on reranking.
+the violation vectors and stores them in a compact VectorStore, then
+identifies the contenders: the vectors that win under some ranking. Winners
+for a particular ranking are looked up on request.
 
 
 Also provides the Typology class. A typology is a set of tableaux that all
 share the same constraint set and gen. It maintains a master dictionary of
-{ranking: outputs}.
+{outputs: ERCs}, mapping each language to the Elementary Ranking Conditions
+that any ranking producing it must satisfy. Inputs and constraints can be
+added to or removed from a typology without rebuilding it.
+
+With compress set, a tableau (or typology) scores one candidate per
+arrangement of the classes of terminals that no constraint tells apart (see
+Gen.classes); the candidates are expanded back into every order they stand
+for wherever they are reported.
 
 """
 
-from bin.gen import Gen
+from bin.gen import Gen, expand
+from bin.linconstraint import score_candidates, score_deltas
+from bin.parallel import score_inputs, score_chunks
+from bin.store import VectorStore
+from bin.erc import optimizable, bounds, options, extend, entails
+from bin.instrument import stage, count, timed
+from collections import Counter
+from collections.abc import Mapping
 from math import factorial
 from itertools import permutations
-from operator import itemgetter
-import tabulate
 
 
 
-class bidict(dict):
-    def __init__(self, *args, **kwargs):
-        super(bidict, self).__init__(*args, **kwargs)
-        self.inverse = {}
-        for key, value in self.items():
-            self.inverse.setdefault(value,[]).append(key) 
+class RankingMap(Mapping):
+	"""
+	A lazy map from rankings (tuples of constraint indices, highest first) to
+	the winning candidates. Nothing is stored per ranking: the winners are
+	found on request among the contender vectors, since whatever wins under a
+	ranking is a contender.
+	"""
+
+	def __init__(self, vectors, candidates):
+		self.vectors = tuple(vectors) # the contender vectors
+		self.candidates = candidates # {vector: candidates}
+		self.size = len(vectors[0]) if vectors else 0
+
+	def __getitem__(self, ranking):
+		if sorted(ranking) != list(range(self.size)):
+			raise KeyError(ranking)
+		count('rankings evaluated')
+		key = lambda v: tuple(v[i] for i in ranking)
+		return(tuple(self.candidates[min(self.vectors, key=key)]))
+
+	def __iter__(self):
+		yield from permutations(range(self.size))
 
-    def __setitem__(self, key, value):
-        if key in self:
-            self.inverse[self[key]].remove(key) 
-        super(bidict, self).__setitem__(key, value)
-        self.inverse.setdefault(value,[]).append(key)        
+	def __len__(self):
+		return(factorial(self.size))
 
-    def __delitem__(self, key):
-        self.inverse.setdefault(self[key],[]).remove(key)
-        if self[key] in self.inverse and not self.inverse[self[key]]: 
-            del self.inverse[self[key]]
-        super(bidict, self).__delitem__(key)
+
+def _entry(prec):
+	# a precset entry in hashable form
+	return((frozenset(prec[0]), frozenset(prec[1])))
 
 
 class Tableau:
-	def __init__(self, inp, constraints, gen = Gen()):
+	@timed('tableau')
+	def __init__(self, inp, constraints, gen = None, vectors = None,
+				 workers = 1, stream = False, cache = None, compress = False):
+		# vectors - optionally, precomputed (candidate, vector) pairs
+		# workers - number of processes to score the candidates in
+		# stream - if set, candidates are consumed one at a time and only
+		#	those that aren't harmonically bounded are kept
+		# cache - optionally, a ResultCache to reuse earlier results from
+		# compress - if set, only one candidate per arrangement of the classes
+		#	of interchangeable terminals is scored
 		self.input = inp
 		self.constraints = tuple(constraints)
-		self.gen = gen
-		self.vectors = self._eval_constraints()
+		# a Gen of our own would never be asked again, so it caches nothing
+		# and the VectorStore is the only copy of the candidates
+		self.gen = gen if gen is not None else Gen(maxsize = 0)
+		self.workers = workers
+		self.stream = stream
+		self.cache = cache
+		self.compress = compress
+		self.classes = self._classes()
+		self._fingerprint = inp.fingerprint # what the vectors were scored on
+
+		key = self._cache_key()
+		cached = cache.get(key) if key else None
+		if cached is not None:
+			self.vectors, contenders = cached
+			self._contender_dict = RankingMap(contenders, self.vectors.inverse)
+			return
+
+		if vectors is None and stream:
+			self.vectors = self._eval_stream()
+		elif vectors is None:
+			self.vectors = self._eval_constraints()
+		elif isinstance(vectors, VectorStore):
+			self.vectors = vectors
+		else:
+			self.vectors = VectorStore(len(self.constraints), vectors)
 		self._contender_dict = self._find_contenders()
+		if key:
+			cache.put(key, (self.vectors, self.contender_vectors))
+
+	def _cache_key(self):
+		if self.cache is None:
+			return(None)
+		extra = ('compress',) if self.compress else () # as before otherwise
+		return(self.cache.key(self.input, self.constraints, self.gen,
+							  self.stream, *extra))
+
+	def _classes(self):
+		# the classes of interchangeable terminals, if compressing
+		if not self.compress:
+			return(None)
+		return(self.gen.classes(self.input, self.constraints))
+
+	def _reclassify(self):
+		# Finds the classes again, after the input or the constraints have
+		# changed. True if they are different, in which case so are the
+		# candidates, and they must all be scored again.
+		classes = self._classes()
+		changed = classes != self.classes
+		self.classes = classes
+		return(changed)
+
+	def expand(self, candidates):
+		# Yields the orders the scored candidates stand for (the candidates
+		# themselves, unless compressed)
+		for candidate in candidates:
+			if self.classes is None:
+				yield(candidate)
+			else:
+				yield from expand(candidate, self.classes)
+
+	def update(self):
+		"""
+		Brings the tableau up to date after its input has been edited in place
+		(see MTree.add_merge, remove_merge and remerge). The precsets of the
+		old and new trees are compared, and each candidate is scored against
+		the entries that changed only; its vector is adjusted by the
+		difference. A streaming tableau, or one whose old precsets are no
+		longer cached, is evaluated again from scratch.
+		"""
+		if self.input.fingerprint == self._fingerprint:
+			return # nothing changed
+		old = [con.cached_precset(self._fingerprint)
+			   for con in self.constraints]
+		self._fingerprint = self.input.fingerprint
+		reclassified = self._reclassify()
+
+		if self.stream:
+			self.vectors = self._eval_stream()
+		elif None in old or reclassified:
+			self.vectors = self._eval_constraints()
+		else:
+			added, removed = [], []
+			for con, precset in zip(self.constraints, old):
+				before = Counter(map(_entry, precset))
+				after = Counter(map(_entry, con[self.input]))
+				added.append(list((after - before).elements()))
+				removed.append(list((before - after).elements()))
+			if any(added) or any(removed):
+				changes = score_deltas(added, removed, iter(self.vectors))
+				self.vectors.adjust(delta for _, delta in changes)
+		self._reevaluate()
 	
 	def _eval_constraints(self):
-		vectors = bidict()
-		for candidate in self.gen(self.input):
-			vectors[candidate] = tuple([con(self.input,candidate) 
-									for con in self.constraints])
-		return(vectors)
+		# score every candidate against every constraint in one batched pass
+		with stage('score', input = self.input.name):
+			if self.workers > 1:
+				return(score_chunks(self.input, self.constraints, self.gen,
+									self.workers, classes = self.classes))
+			return(VectorStore(len(self.constraints),
+							   score_candidates(self.input, self.constraints,
+												self.gen(self.input,
+														 classes = self.classes))))
+
+	def _eval_stream(self):
+		# Scores the candidates as Gen yields them, keeping only the running
+		# frontier of vectors that no other candidate harmonically bounds,
+		# with their candidates. Vectors once bounded stay bounded (whatever
+		# bounded them, or something bounding that, stays in the frontier),
+		# so they are remembered and skipped.
+		frontier = dict() # vector -> candidates
+		dropped = set() # bounded vectors
+		scored = score_candidates(self.input, self.constraints,
+								  self.gen.stream(self.input,
+												  classes = self.classes))
+		with stage('score', input = self.input.name, stream = True):
+			for candidate, vector in scored:
+				if vector in frontier:
+					frontier[vector].append(candidate)
+					continue
+				if vector in dropped:
+					continue
+				if any(bounds(w, vector) for w in frontier):
+					dropped.add(vector)
+					continue
+				for w in [w for w in frontier if bounds(vector, w)]:
+					del frontier[w]
+					dropped.add(w)
+				frontier[vector] = [candidate]
+		return(VectorStore(len(self.constraints),
+						   ((c, v) for v in frontier for c in frontier[v])))
+
+	def add_constraint(self, con):
+		# Adds a constraint, scoring the candidates against it alone and
+		# appending its column to the stored vectors.
+		self.constraints += (con,)
+		if self._reclassify(): # the candidates have changed
+			self.vectors = (self._eval_stream() if self.stream else
+							self._eval_constraints())
+		elif self.stream:
+			self.vectors = self._eval_stream()
+		else:
+			scored = score_candidates(self.input, [con], iter(self.vectors))
+			self.vectors.add_column(vector[0] for _, vector in scored)
+		self._reevaluate()
+
+	def remove_constraint(self, con):
+		# Removes a constraint and its column of the stored vectors.
+		col = self.constraints.index(con)
+		self.constraints = self.constraints[:col] + self.constraints[col + 1:]
+		if self._reclassify(): # the candidates have changed
+			self.vectors = (self._eval_stream() if self.stream else
+							self._eval_constraints())
+		elif self.stream:
+			self.vectors = self._eval_stream()
+		else:
+			self.vectors.remove_column(col)
+		self._reevaluate()
+
+	def _reevaluate(self):
+		# finds the contenders again, after the vectors have changed
+		self._contender_dict = self._find_contenders()
+		key = self._cache_key()
+		if key:
+			self.cache.put(key, (self.vectors, self.contender_vectors))
 
 	def _find_contenders(self):
-		# The general process:
-		# for each possible constraint ranking:
-		#	sort the bidict.inverse accordingly
-		#	take the first item
-		#	save the candidates in a set
-		# Except we won't rerank the constraints; instead, we'll just generate
-		# possible tuples of range(n).
-		contenders = bidict()
-		for ranking in permutations(range(len(self.constraints))):
-			winning_vector = sorted(self.vectors.inverse.keys(),
-									key=itemgetter(*ranking))[0]
-			contenders[tuple(ranking)] = tuple(self.vectors.inverse[winning_vector])
-		return(contenders)
+		# A vector is a contender iff it wins under some ranking, i.e. iff the
+		# ERCs comparing it to every other vector are consistent; we check
+		# that with RCD instead of trying every ranking. The result is a lazy
+		# map from rankings to winners.
+		vectors = list(self.vectors.inverse.keys())
+		with stage('contenders', input = self.input.name):
+			contenders = tuple(v for v in vectors if optimizable(v, vectors))
+		count('contender checks', len(vectors))
+		return(RankingMap(contenders, self.vectors.inverse))
+
+	@property
+	def contender_vectors(self):
+		return(self._contender_dict.vectors)
 
 	@property
 	def contenders(self):
 		winners = set()
-		for item in self._contender_dict.inverse.keys():
-			winners.update(item)
+		for vector in self._contender_dict.vectors:
+			winners.update(self.expand(self.vectors.inverse[vector]))
 		return(winners)
 
+	def bounded(self):
+		# Yields (candidate, vector) for every candidate that isn't a
+		# contender. A streaming tableau doesn't keep these, so they are
+		# generated and scored again.
+		contenders = set(self.contender_vectors)
+		if self.stream:
+			scored = score_candidates(self.input, self.constraints,
+									  self.gen.stream(self.input,
+													  classes = self.classes))
+		else:
+			scored = self.vectors.items()
+		for candidate, vector in scored:
+			if vector not in contenders:
+				for order in self.expand([candidate]):
+					yield((order, vector))
+
 	def get_winners(self,ranking):
 		# expects the constraints ranked in some order
 		order = tuple([self.constraints.index(con) for con in ranking])
-		return(tuple(self._contender_dict[order]))
+		return(tuple(self.expand(self._contender_dict[order])))
 
 	### printing
 
@@ -93,11 +297,10 @@ class Tableau:
 		constraints = list(self.constraints)
 		inp = self.input
 
-		winners = {w: self.vectors[w] for w in self.contenders}
+		winners = {c: v for v in self.contender_vectors
+				   for c in self.expand(self.vectors.inverse[v])}
 		if include_bounded:
-			bounded = {c: self.vectors[c] 
-					   for c in self.vectors 
-					   if c not in winners}
+			bounded = dict(self.bounded())
 		else: bounded = []
 
 		header = [str(inp)] + [str(x) for x in constraints]
@@ -111,6 +314,7 @@ class Tableau:
 		return((rows,header))
 
 	def print_ascii(self, include_bounded=False):
+		import tabulate # slow to import; only needed for printing
 		return(tabulate.tabulate(*self._make_table(include_bounded)))
 
 
@@ -165,11 +369,10 @@ class Tableau:
 
 		con_names = ' & '.join([f'\\textsc{{{c}}}' for c in constraints])
 
-		winners = {w: self.vectors[w] for w in self.contenders}
+		winners = {c: v for v in self.contender_vectors
+				   for c in self.expand(self.vectors.inverse[v])}
 		if include_bounded:
-			bounded = {c: self.vectors[c] 
-					   for c in self.vectors 
-					   if c not in winners}
+			bounded = dict(self.bounded())
 		else: bounded = []
 
 
@@ -195,27 +398,136 @@ class Tableau:
 
 		return(output)
 
+	def to_json(self, include_bounded = False):
+		# The tableau as a JSON-ready dict; bounded candidates are included
+		# only if include_bounded is set
+		rows = lambda pairs: [{'candidate': c, 'violations': list(v)}
+							  for c, v in pairs]
+		output = {'input': self.input.name,
+				  'constraints': [str(c) for c in self.constraints],
+				  'contenders': rows((c, v) for v in self.contender_vectors
+									 for c in self.expand(
+										 self.vectors.inverse[v]))}
+		if include_bounded:
+			output['bounded'] = rows(self.bounded())
+		return(output)
+
 	def __repr__(self):
 		return(self.print_ascii())
 
 
 
 class Typology:
-	def __init__(self, inputs, constraints, gen = Gen()):
+	@timed('typology')
+	def __init__(self, inputs, constraints, gen = None, workers = 1,
+				 cache = None, compress = False):
+		# workers - number of processes to evaluate the tableaux in
+		# cache - optionally, a ResultCache shared by the tableaux
+		# compress - as for Tableau
 		self.inputs = tuple(inputs)
 		self.constraints = tuple(constraints)
-		self.gen = gen
-		self.tableaux = [Tableau(inp,constraints,gen = self.gen)
-						for inp in self.inputs]
-
-		self.languages = bidict()
-		for ranking in permutations(self.constraints):
-			self.languages[ranking] = tuple([tab.get_winners(ranking) for
-										tab in self.tableaux])
+		self.gen = gen if gen is not None else Gen() # shared by the tableaux
+		self.cache = cache
+		self.compress = compress
+		stores = dict() # input index -> precomputed VectorStore
+		if workers > 1:
+			extra = ('compress',) if compress else ()
+			todo = [i for i, inp in enumerate(self.inputs)
+					if cache is None or
+					   cache.key(inp, self.constraints, self.gen, False,
+								 *extra) not in cache]
+			with stage('score', workers = workers):
+				scored = score_inputs([self.inputs[i] for i in todo],
+									  self.constraints, self.gen, workers,
+									  compress = compress)
+			stores = dict(zip(todo, scored))
+		self.tableaux = [Tableau(inp, self.constraints, gen = self.gen,
+								 vectors = stores.get(i), cache = cache,
+								 compress = compress)
+						 for i, inp in enumerate(self.inputs)]
+
+		self._find_languages()
+
+	def _find_languages(self):
+		# A language picks one contender per tableau; it exists iff the ERCs
+		# needed for all of those to win at once are consistent. Languages are
+		# built one tableau at a time, dropping inconsistent partial ones, so
+		# the work depends on the number of languages rather than on c!.
+		n = len(self.constraints)
+		with stage('languages'):
+			self._options = [dict(options(tab.contender_vectors))
+							 for tab in self.tableaux]
+			languages = [((), frozenset())]
+			for choices in self._options:
+				languages = list(extend(languages, choices.items(), n))
+				count('partial languages', len(languages))
+		self._set_languages(languages)
+
+	def _set_languages(self, languages):
+		# languages - (contender vectors, ERCs) pairs; sets self.languages to
+		# {language: ERCs}, with the languages spelled out as candidates
+		self._languages = languages
+		self.languages = {tuple(tuple(tab.expand(tab.vectors.inverse[v]))
+								for tab, v in zip(self.tableaux, vectors)): ercs
+						  for vectors, ercs in languages}
+
+	### editing
+
+	def add_input(self, inp, vectors = None):
+		"""
+		Adds a tableau for a new input. The existing languages are extended
+		by its contenders, as if it had come last all along.
+		"""
+		tab = Tableau(inp, self.constraints, gen = self.gen, vectors = vectors,
+					  cache = self.cache, compress = self.compress)
+		self.inputs += (inp,)
+		self.tableaux.append(tab)
+		choices = dict(options(tab.contender_vectors))
+		self._options.append(choices)
+		self._set_languages(list(extend(self._languages, choices.items(),
+										len(self.constraints))))
+		return(tab)
+
+	def remove_input(self, inp):
+		"""
+		Removes the tableau for an input. Every language of the remaining
+		tableaux is the rest of some old language (a ranking that produces it
+		produces some winner for the removed input too), so the languages are
+		just cut down and merged; their ERCs are those of the remaining
+		choices.
+		"""
+		i = self.inputs.index(inp)
+		self.inputs = self.inputs[:i] + self.inputs[i + 1:]
+		del self.tableaux[i]
+		del self._options[i]
+		keys = {vectors[:i] + vectors[i + 1:] for vectors, _ in self._languages}
+		self._set_languages([(vectors, frozenset().union(
+								*(choices[v] for choices, v
+								  in zip(self._options, vectors))))
+							 for vectors in keys])
+
+	def add_constraint(self, con):
+		"""
+		Adds a constraint. Each tableau scores its candidates against the new
+		constraint only; the contenders and languages are then found again,
+		since the ERCs all gain a column.
+		"""
+		self.constraints += (con,)
+		for tab in self.tableaux:
+			tab.add_constraint(con)
+		self._find_languages()
+
+	def remove_constraint(self, con):
+		# Removes a constraint; the tableaux drop its column of their vectors.
+		col = self.constraints.index(con)
+		self.constraints = self.constraints[:col] + self.constraints[col + 1:]
+		for tab in self.tableaux:
+			tab.remove_constraint(con)
+		self._find_languages()
 
 	@property
 	def size(self):
-		return(len(self.languages.inverse))
+		return(len(self.languages))
 
 	def __getitem__(self,inp):
 		for tableau in self.tableaux:
@@ -223,40 +535,41 @@ class Typology:
 				return(tableau)
 		raise IndexError('No such input.')
 
+	def get_language(self,ranking):
+		# the winners of every tableau under a particular ranking
+		return(tuple([tab.get_winners(ranking) for tab in self.tableaux]))
+
 	### printing
 
-	def summarize_rankings(self,rankingset):
-		# Takes a list of rankings and expresses it in a condensed format:
-		# - if n=1: Return a list containing that one
-		# - if n=c!: return an empty list
+	def summarize_rankings(self,ercs):
+		# Takes the ERCs of a language and expresses the rankings consistent
+		# with them in a condensed format:
+		# - if only one ranking is consistent: return a list containing it
 		# otherwise, return a list:
 		# - if X is always undominated, the list includes (X,)
 		# - if X always dominates Y (but X is dominated at least once), the set
 		# includes (X,Y)
+		# (so if every ranking is consistent, the list is empty)
 
-		# Base-cases first:
+		n = len(self.constraints)
+		pairs = [(a,b) for a in range(n) for b in range(n)
+				 if a != b and entails(ercs, n, a, b)]
 
-		if len(rankingset) == 1: return(list(rankingset))
-		if len(rankingset) == factorial(len(rankingset[0])):
-			return([])
+		# Base-case first: a total order
+		if len(pairs) == n * (n-1) // 2:
+			above = {a: 0 for a in range(n)}
+			for (a,b) in pairs: above[b] += 1
+			return([tuple(self.constraints[a]
+						  for a in sorted(above, key=above.get))])
 
 		# Is anything always undominated?
-		dominators = {ranking[0] for ranking in rankingset}
-		if len(dominators) == 1:
-			undominated = [(list(dominators)[0],)]
-		else: undominated = []
+		undominated = [a for a in range(n)
+					   if all((a,b) in pairs for b in range(n) if b != a)]
 
-		# Convert each ranking into a set of binary ranking statements
-		# if we've found an undominated thing, we can just ignore it
-		binarize = lambda ranking: set([ (ranking[i], ranking[j])
-									  for i in range(len(ranking)-1)
-									  for j in range(i+1,len(ranking)) ])
-		if undominated: _u = lambda x: x[1:]
-		else: _u = lambda x: x
-		bin_rankings = [binarize(_u(ranking)) for ranking in rankingset]
-		bin_rankings = set.intersection(*bin_rankings) # reduce
-
-		return(undominated + list(bin_rankings))
+		# If we've found an undominated thing, we can just ignore it
+		pairs = [(a,b) for (a,b) in pairs if a not in undominated]
+		return([(self.constraints[a],) for a in undominated] +
+			   [(self.constraints[a], self.constraints[b]) for (a,b) in pairs])
 
 
 	def _make_table(self):
@@ -265,18 +578,31 @@ class Typology:
 		header = ['Ranking Conditions'] + [str(t.input) for t in self.tableaux]
 
 		rows = []
-		for lang in self.languages.inverse:
-			ranking_con = self.summarize_rankings(self.languages.inverse[lang])
+		for lang in self.languages:
+			ranking_con = self.summarize_rankings(self.languages[lang])
 			ranking_con = '\n'.join([f'{x}' for x in ranking_con])
 			outputs = [', '.join(l) for l in lang]
 			rows.append([ranking_con] + outputs)
 
 		return((rows,header))
 
+	def to_json(self):
+		# The typology as a JSON-ready dict. Each language lists the winners
+		# for each input, and its ranking conditions as in _make_table.
+		names = lambda cons: [str(c) for c in cons]
+		return({'inputs': [t.input.name for t in self.tableaux],
+				'constraints': names(self.constraints),
+				'languages': [{'outputs': [list(l) for l in lang],
+							   'rankings': [names(x) for x in
+											self.summarize_rankings(ercs)]}
+							  for lang, ercs in self.languages.items()]})
+
 	def print_ascii(self):
+		import tabulate
 		return(tabulate.tabulate(*self._make_table(),tablefmt='grid'))
 
 	def print_tabular(self):
+		import tabulate
 		return(tabulate.tabulate(*self._make_table(),tablefmt='latex'))
 
 	def __str__(self):
@@ -8,6 +8,12 @@ Usage:
     otlinearize.py tableau [options] <tree>
     otlinearize.py typology [options] <trees>...
     otlinearize.py typology [options] -f <treelist>
+    otlinearize.py typology [options] -c <corpus>
+    otlinearize.py convert <corpus> <trees>...
+    otlinearize.py sweep [options] <terminals>
+    otlinearize.py serve [options]
+    otlinearize.py batch [options] [<jobs>]
+    otlinearize.py solve [options] <tree> [<ranking>...]
 
 Options:
     -h, --help     Show this screen.
@@ -16,38 +22,60 @@ Options:
     -a, --all      For tableau: output all candidates (not just contenders).
     --latex        Output in LaTeX format (as opposed to ASCII).
     --alpha=NODE   Use the default constraints, but specify HF-alpha.
+    -j N           Evaluate with N worker processes [default: 1].
+    -s, --stream   For tableau: keep only contenders in memory while scoring.
+    --compress     Score one order per arrangement of interchangeable terminals.
+    --cache=DIR    Reuse evaluated tableaux stored in the cache directory DIR.
+    --moves=N      For sweep: allow up to N phrasal movements [default: 0].
+    --shapes       For sweep: treat trees differing only in labels as one.
+    --profile=FILE  Write stage times, peak memory and counters to FILE.
+    --profile-format=FMT  json, or chrome for a Chrome trace [default: json].
+    --port=PORT    For serve: the localhost port to listen on [default: 8765].
+    --limit=N      For solve: print at most N winners.
 """
 
 
 from docopt import docopt
-from itertools import permutations
-import tabulate
 
-from bin.mtree import *
-from bin.gen import *
-from bin.con import *
-from bin.tableau import *
+# Everything else is imported by the commands that need it, so that a single
+# run only pays for what it uses.
 
 if __name__ == '__main__':
 
 	args = docopt(__doc__,version='OTLinearize 1.0')
 
-	# Build our Con:
-	conlist = [ Antisymmetry(),
-				HeadFinality(),
-				HeadFinality(alpha = 'BP' if not args['--alpha']
-										  else args['--alpha']),
-				]
+	if args['tableau'] or args['typology'] or args['sweep']:
+		# Build our Con:
+		from bin.con import build_constraints
+		conlist = build_constraints(alpha = args['--alpha'])
+
+	if args['--cache'] and (args['tableau'] or args['typology']):
+		from bin.cache import ResultCache
+		cache = ResultCache(args['--cache'])
+	else:
+		cache = None
+
+	if args['--profile']:
+		from bin.instrument import Profiler
+		profiler = Profiler()
+		profiler.start()
+	else:
+		profiler = None
 
 	if args['tableau']:
 		# We're making a single tableau; get the tree.
+		from bin.mtree import parseTreeFile
+		from bin.tableau import Tableau
 		tree = parseTreeFile(args['<tree>'])
 
 		# now build the tableau:
-		output = Tableau(tree, conlist)
+		output = Tableau(tree, conlist, workers = int(args['-j']),
+						 stream = args['--stream'], cache = cache,
+						 compress = args['--compress'])
 
 		# If -t is set:
 		if args['-t']:
+			import tabulate
 			print(tabulate.tabulate([(str(tree),tree.bracket_string())],tablefmt='plain'))
 			print()
 
@@ -61,20 +89,29 @@ if __name__ == '__main__':
 	elif args['typology']:
 		# We're making a typology. Either we've been given a list of tree files
 		# directly, or we need to parse one.
+		from bin.mtree import parseTreeFile
+		from bin.tableau import Typology
 
-		if args['<trees>']:
-			trees = args['<trees>']
-		elif args['<treelist>']:
-			with open(args['<treelist>'],'r') as treef:
-				trees = treef.read()
-				trees = trees.splitlines()
-		treelist = [parseTreeFile(t) for t in trees]
+		if args['<corpus>']:
+			from bin.corpus import Corpus
+			with Corpus(args['<corpus>']) as corpus:
+				treelist = list(corpus)
+		else:
+			if args['<trees>']:
+				trees = args['<trees>']
+			elif args['<treelist>']:
+				with open(args['<treelist>'],'r') as treef:
+					trees = treef.read()
+					trees = trees.splitlines()
+			treelist = [parseTreeFile(t) for t in trees]
 
 		# Make our typology:
-		output = Typology(treelist, conlist)
+		output = Typology(treelist, conlist, workers = int(args['-j']),
+						  cache = cache, compress = args['--compress'])
 
 		# If -t is set:
 		if args['-t']:
+			import tabulate
 			print(tabulate.tabulate([(str(t),t.bracket_string()) for t in treelist],
 				tablefmt='plain'))
 			print()
@@ -85,9 +122,71 @@ if __name__ == '__main__':
 		else:
 			print(output.print_ascii())
 
-	
+	elif args['sweep']:
+		# Every tree over a set of terminals, e.g. "A,B,C"; each is printed
+		# with its languages as soon as it has been evaluated.
+		from bin.sweep import sweep
+		from bin.tableau import Typology
+		terminals = [t for t in ''.join(args['<terminals>'].split()).split(',')
+					 if t]
+		summary = Typology([], conlist) # for summarize_rankings
+		for tree, languages in sweep(terminals, conlist,
+									 moves = int(args['--moves']),
+									 workers = int(args['-j']),
+									 labels = not args['--shapes']):
+			print(tree.name, tree.bracket_string)
+			for lang, ercs in languages.items():
+				conditions = summary.summarize_rankings(ercs)
+				print('   ', ', '.join(lang[0]), '\t',
+					  ' '.join(f'{x}' for x in conditions))
+
+	elif args['serve']:
+		# Answer JSON requests on localhost until interrupted
+		from bin.service import serve
+		serve(port = int(args['--port']), workers = int(args['-j']),
+			  cache = args['--cache'],
+			  ready = lambda server: print('Serving on http://%s:%d' %
+										   server.server_address, flush = True))
+
+	elif args['solve']:
+		# The winners under one ranking, given as constraint names, highest
+		# first (by default, the default constraints in order)
+		from bin.mtree import parseTreeFile
+		from bin.con import build_constraints
+		from bin.search import solve
+		ranking = build_constraints(args['<ranking>'] or None,
+									alpha = args['--alpha'])
+		tree = parseTreeFile(args['<tree>'])
+		winners, vector = solve(tree, ranking, limit = int(args['--limit'])
+								if args['--limit'] else None)
+		print(' >> '.join(str(c) for c in ranking))
+		for winner in winners:
+			print(winner, '\t', ' '.join(str(v) for v in vector))
+
+	elif args['batch']:
+		# Evaluate JSON lines jobs from a file or stdin, writing each result
+		# as a JSON line as soon as it's ready
+		import sys
+		from bin.batch import run_batch
+		if args['<jobs>'] and args['<jobs>'] != '-':
+			with open(args['<jobs>']) as jobs:
+				run_batch(jobs, sys.stdout, workers = int(args['-j']),
+						  cache = args['--cache'])
+		else:
+			run_batch(sys.stdin, sys.stdout, workers = int(args['-j']),
+					  cache = args['--cache'])
+
+	elif args['convert']:
+		# Pack tree files into a single corpus file, for typology -c
+		from bin.corpus import convert
+		convert(args['<trees>'], args['<corpus>'])
+
 	else:
 		# No command, just freak out
 		print(__doc__)
 		quit()
 
+	if profiler:
+		profiler.stop()
+		profiler.save(args['--profile'], args['--profile-format'])
+
@@ -0,0 +1,27 @@
+#! /usr/python
+
+import pytest
+from bin import mtree
+from bin import con
+
+
+@pytest.fixture(params = ["Basic",
+						  "BaseGenSpec",
+						  "MovedSpec",
+						  "RollUpHead",
+						  "RollUpHeadEmpty",
+						  "LongHeadEmpty",
+						  "LongMovedSpec",
+						  "HighHead",
+						  "ComplexMovedSpec",])
+def tree(request):
+	t = mtree.parseTreeFile('trees/paper/' + request.param + '.txt')
+	return(t)
+
+
+@pytest.fixture
+def conlist():
+	return([ con.Antisymmetry(),
+			 con.HeadFinality(),
+			 con.HeadFinality(alpha = 'BP'),
+			 ])
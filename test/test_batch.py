@@ -0,0 +1,70 @@
+#! /usr/python
+
+import pytest
+import io
+import json
+from bin import batch
+from bin import mtree
+from bin import con
+from bin import tableau
+
+
+def run(lines, workers = 1):
+	out = io.StringIO()
+	batch.run_batch(lines, out, workers = workers)
+	return([json.loads(line) for line in out.getvalue().splitlines()])
+
+
+@pytest.fixture
+def jobs():
+	return([json.dumps({'path': 'trees/paper/MovedSpec.txt', 'all': True}),
+			'',
+			json.dumps({'id': 'ascii', 'path': 'trees/paper/Basic.txt',
+						'alpha': 'BP', 'format': 'ascii'}),
+			json.dumps({'kind': 'typology',
+						'paths': ['trees/paper/Basic.txt',
+								  'trees/paper/HighHead.txt'],
+						'constraints': ['Antisymmetry', 'HeadFinality-BP']}),
+			'not json',
+			json.dumps({'path': 'trees/paper/Basic.txt', 'format': 'html'})])
+
+
+def test_batch(jobs):
+	results = run(jobs)
+	assert [r['id'] for r in results] == [1, 'ascii', 4, 5, 6]
+
+	tree = mtree.parseTreeFile('trees/paper/MovedSpec.txt')
+	expected = tableau.Tableau(tree, con.build_constraints())
+	assert results[0]['result'] == expected.to_json(include_bounded = True)
+
+	tree = mtree.parseTreeFile('trees/paper/Basic.txt')
+	expected = tableau.Tableau(tree, con.build_constraints(alpha = 'BP'))
+	assert results[1]['output'] == expected.print_ascii()
+
+	trees = [mtree.parseTreeFile('trees/paper/' + n + '.txt')
+			 for n in ('Basic', 'HighHead')]
+	expected = tableau.Typology(trees, con.build_constraints(
+		['Antisymmetry', 'HeadFinality-BP']))
+	assert results[2]['result'] == expected.to_json()
+
+	assert 'Bad job' in results[3]['error']
+	assert 'html' in results[4]['error']
+
+def test_batch_parallel(jobs):
+	serial = run(jobs)
+	parallel = run(jobs, workers = 2)
+	key = lambda r: str(r['id'])
+	assert sorted(parallel, key = key) == sorted(serial, key = key)
+
+def test_batch_errors():
+	results = run([json.dumps({'path': 'trees/nothing.txt'}),
+				   json.dumps({'tree': 'A, B\nA0, B1\n'}),
+				   json.dumps({'kind': 'nothing', 'tree': 'A\nA0\n'}),
+				   json.dumps([1, 2]),
+				   json.dumps({'path': 'trees/paper/Basic.txt', 'alpha': 'QP'})])
+	assert 'nothing.txt' in results[0]['error']
+	assert 'B1' in results[1]['error']
+	assert 'nothing' in results[2]['error']
+	assert 'objects' in results[3]['error']
+	assert results[4]['error'] == \
+		   "Tree Basic has no node QP (the alpha of HeadFinality-QP)"
@@ -0,0 +1,28 @@
+#! /usr/python
+
+import pytest
+from bin import bench
+from bin import mtree
+
+
+@pytest.mark.parametrize('terminals, depth, remerges',
+						 [(1, 1, 0), (4, 4, 0), (6, 3, 2), (8, 2, 5)])
+def test_synthetic_tree(terminals, depth, remerges):
+	tree = mtree.parseTreeString(bench.synthetic_tree(terminals, depth,
+													  remerges))
+	assert len(tree.terminals) == terminals
+	assert len([n for n in tree if len(n.mothers) > 1]) == \
+		   min(remerges, terminals - 1)
+
+def test_bench_results(tmp_path):
+	results = bench.run_suite([(4, 2, 1, 3)], repeat = 1)
+	assert [r['stage'] for r in results] == list(bench.STAGES)
+	assert all(r['seconds'] >= 0 and r['peak_bytes'] > 0 for r in results)
+	path = str(tmp_path / 'bench.json')
+	bench.save(results, path)
+	old = bench.load(path)
+	slower = dict(old, results = [dict(r, seconds = 2 * r['seconds'] + 1)
+								  for r in results])
+	rows = bench.compare(old, slower)
+	assert len(rows) == len(results)
+	assert all(row[-1] == 'SLOWER' for row in rows)
@@ -0,0 +1,41 @@
+#! /usr/python
+
+import pytest
+from bin import mtree
+from bin import con
+from bin import tableau
+from bin import gen
+from bin import cache
+
+
+@pytest.fixture
+def results(tmp_path):
+	return(cache.ResultCache(str(tmp_path)))
+
+def basic():
+	return(mtree.parseTreeFile('trees/paper/Basic.txt'))
+
+
+def test_cache_reuses_reparsed_tree(results):
+	conlist = [con.Antisymmetry(), con.HeadFinality()]
+	first = tableau.Tableau(basic(), conlist, cache = results)
+	second = tableau.Tableau(basic(), conlist, cache = results)
+	assert (results.hits, results.misses) == (1, 1)
+	assert second.vectors == first.vectors
+	assert second.contenders == first.contenders
+
+def test_cache_keys_constraint_parameters(results):
+	g = gen.Gen()
+	keys = {results.key(basic(), [con.HeadFinality(alpha = a)], g)
+			for a in [None, 'BP', 'CP']}
+	assert len(keys) == 3
+
+def test_cache_skips_anonymous_gens(results):
+	g = gen.Gen(lambda x: gen.gen_strings(x))
+	assert results.key(basic(), [con.Antisymmetry()], g) is None
+
+def test_cache_evicts(tmp_path):
+	results = cache.ResultCache(str(tmp_path), max_bytes = 100)
+	results.put('a', 'x' * 60)
+	results.put('b', 'x' * 60)
+	assert 'a' not in results and 'b' in results
@@ -0,0 +1,45 @@
+#! /usr/python
+
+import pytest
+from glob import glob
+from bin import corpus
+from bin import mtree
+
+
+@pytest.fixture
+def tree_files():
+	return(sorted(glob('trees/*.txt') + glob('trees/paper/*.txt')))
+
+
+def test_corpus_round_trip(tree_files, tmp_path):
+	path = str(tmp_path / 'trees.otlc')
+	corpus.convert(tree_files, path)
+	with corpus.Corpus(path) as trees:
+		assert len(trees) == len(tree_files)
+		for fname, tree in zip(tree_files, trees):
+			original = mtree.parseTreeFile(fname)
+			assert tree.name == original.name
+			assert tree.fingerprint == original.fingerprint
+		assert trees[-1].name == trees.names[-1]
+
+def test_corpus_keeps_edits(tmp_path):
+	path = str(tmp_path / 'edited.otlc')
+	tree = mtree.parseTreeFile('trees/paper/Basic.txt')
+	tree.remerge('CP', 'AP')
+	corpus.write_corpus(path, [tree])
+	[loaded] = corpus.load_corpus(path)
+	assert loaded.fingerprint == tree.fingerprint
+
+def test_bad_corpus(tmp_path):
+	path = tmp_path / 'bad.otlc'
+	path.write_bytes(b'A, B\nA0, B0\n')
+	with pytest.raises(corpus.CorpusError):
+		corpus.Corpus(str(path))
+
+	good = tmp_path / 'good.otlc'
+	corpus.convert(['trees/paper/Basic.txt'], str(good))
+	data = good.read_bytes()
+	for bad in (data[:-4], data + b'\0\0\0\0', data[:corpus.HEADER.size], b''):
+		path.write_bytes(bad)
+		with pytest.raises(corpus.CorpusError):
+			corpus.Corpus(str(path))
@@ -0,0 +1,22 @@
+#! /usr/python
+
+import pytest
+from bin import erc
+
+
+def test_erc():
+	assert erc.erc((0,1,2),(1,1,0)) == ('W','e','L')
+
+def test_rcd_stratifies():
+	ercs = [('W','L','e'), ('e','W','L')]
+	assert erc.rcd(ercs, 3) == [{0}, {1}, {2}]
+
+def test_rcd_inconsistent():
+	ercs = [('W','L'), ('L','W')]
+	assert erc.rcd(ercs, 2) is None
+
+def test_optimizable():
+	vectors = [(0,2), (2,0), (1,1), (2,2)]
+	assert erc.optimizable((0,2), vectors)
+	assert not erc.optimizable((1,1), vectors) # collectively bounded
+	assert not erc.optimizable((2,2), vectors) # harmonically bounded
@@ -0,0 +1,60 @@
+#! /usr/python
+
+import pytest
+from bin import mtree
+from bin import gen
+
+
+@pytest.fixture
+def trees():
+	return([mtree.parseTreeFile('trees/paper/' + name + '.txt')
+			for name in ["Basic", "LongMovedSpec", "HighHead"]])
+
+
+def test_cache_hits_reparsed_tree():
+	g = gen.Gen(null_phon = {'E'})
+	first = list(g(mtree.parseTreeFile('trees/paper/Basic.txt')))
+	second = list(g(mtree.parseTreeFile('trees/paper/Basic.txt', name = 'x')))
+	assert first == second
+	assert (g.hits, g.misses) == (1, 1)
+
+
+def test_cache_evicts_and_spills(trees, tmp_path):
+	# Basic has 3! candidates, the others 4!
+	g = gen.Gen(maxsize = 30, spill = str(tmp_path))
+	for t in trees:
+		list(g(t))
+	assert g.evictions == 2 and g.size == 24
+	assert len(list(tmp_path.iterdir())) == 2
+
+	assert sorted(g[trees[0]]) == sorted(gen.gen_strings(trees[0]))
+	assert g.cache_info().spill_hits == 1
+
+
+def test_cache_spills_oversized(trees, tmp_path):
+	g = gen.Gen(maxsize = 10, spill = str(tmp_path))
+	for t in trees:
+		list(g(t))
+	assert g.evictions == 0 and g.size == 6
+	assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_gen_classes(trees):
+	# one order per arrangement of the classes, standing for all the others
+	classes = (('a', 'c'), ('b',), ('d',))
+	compressed = list(gen.gen_strings(trees[2], classes = classes))
+	assert len(compressed) == 12
+	assert all(c.index('a') < c.index('c') for c in compressed)
+	assert compressed == sorted(compressed)
+	expanded = [o for c in compressed for o in gen.expand(c, classes)]
+	assert sorted(expanded) == sorted(gen.gen_strings(trees[2]))
+	assert [c for first in 'abd' for c in
+			gen.gen_strings(trees[2], classes = classes, first = first)] == \
+		   compressed
+
+
+def test_uncached_gen(trees):
+	g = gen.Gen(maxsize = 0)
+	assert list(g(trees[0])) == list(gen.gen_strings(trees[0]))
+	list(g(trees[0]))
+	assert (g.hits, g.misses, g.size) == (0, 2, 0)
@@ -0,0 +1,38 @@
+#! /usr/python
+
+import pytest
+from bin import instrument
+from bin import mtree
+from bin import tableau
+from bin import gen
+
+
+def test_profile_tableau(conlist):
+	with instrument.Profiler() as prof:
+		tree = mtree.parseTreeFile('trees/paper/ComplexMovedSpec.txt')
+		t = tableau.Tableau(tree, conlist, gen = gen.Gen())
+		t.get_winners(conlist)
+	assert not instrument.active()
+	stages = prof.stages()
+	for name in ('parse', 'gen', 'score', 'contenders', 'tableau'):
+		assert stages[name]['calls'] == 1
+	assert stages['tableau']['seconds'] >= stages['score']['seconds']
+	assert stages['tableau']['peak_bytes'] >= stages['score']['peak_bytes'] > 0
+	assert prof.counters['candidates generated'] == 24
+	assert prof.counters['candidates scored'] == 24
+	assert prof.counters['rankings evaluated'] == 1
+	trace = prof.chrome_trace()['traceEvents']
+	assert {e['ph'] for e in trace} == {'X', 'C'}
+
+def test_disabled_profile_records_nothing(conlist):
+	prof = instrument.Profiler(memory = False)
+	tree = mtree.parseTreeFile('trees/paper/Basic.txt')
+	tableau.Tableau(tree, conlist, gen = gen.Gen())
+	assert prof.spans == [] and not prof.counters
+	with prof:
+		with instrument.stage('outer'):
+			with instrument.stage('inner', x = 1):
+				instrument.count('things', 2)
+	assert [s[0] for s in prof.spans] == ['inner', 'outer']
+	assert prof.report()['spans'][1]['args'] == {'x': 1}
+	assert prof.counters['things'] == 2
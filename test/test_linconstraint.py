@@ -0,0 +1,35 @@
+#! /usr/python
+
+import pytest
+from bin import mtree
+from bin import con
+from bin import gen
+from bin import linconstraint
+
+
+def test_compiled_kernel_matches_check_viol(tree):
+	conlist = [ con.Antisymmetry(),
+				con.HeadFinality(),
+				con.HeadFinality(alpha = 'CP'),
+				]
+	candidates = list(gen.gen_strings(tree, null_phon = {'E'}))
+	scored = linconstraint.score_candidates(tree, conlist, candidates)
+
+	for candidate, vector in scored:
+		expected = tuple(sum(c.check_viol(prec, candidate) for prec in c[tree])
+						 for c in conlist)
+		assert vector == expected
+
+
+def test_precset_cache_is_structural():
+	linconstraint.precset_cache.clear()
+	first = mtree.parseTreeFile('trees/paper/LongMovedSpec.txt')
+	second = mtree.parseTreeFile('trees/paper/LongMovedSpec.txt', name = 'copy')
+
+	con.HeadFinality()[first]
+	hits = linconstraint.precset_cache.hits
+	assert con.HeadFinality()[second] == con.HeadFinality()[first]
+	assert linconstraint.precset_cache.hits == hits + 2
+	assert con.HeadFinality(alpha = 'BP')[second] != con.HeadFinality()[second]
+
+	assert first.relations.tables is second.relations.tables
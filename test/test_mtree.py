@@ -15,3 +15,79 @@ def test_terminal_node_repr(terminal_a):
 	assert str(terminal_a) == 'A0'
 
 
+
+@pytest.fixture(params = ["paper/RollUpHeadEmpty",
+						  "paper/LongMovedSpec",
+						  "paper/ComplexMovedSpec",
+						  "rollup-with-specs",
+						  "big-phrase-mvt",])
+def paper_tree(request):
+	return(parseTreeFile('trees/' + request.param + '.txt'))
+
+def test_relations_match_paths(paper_tree):
+	for x in paper_tree:
+		for y in paper_tree:
+			dominates = bool([p for p in y.paths if x in p])
+			path_command = all(set(p) & set(x.projections) for p in y.paths)
+			assert x.dominates(y) == dominates
+			assert x.path_command(y) == path_command
+
+def test_relation_matrices_match_paths(paper_tree):
+	dom = lambda x, y: any(x in p for p in y.paths)
+	pc = lambda x, y: all(set(p) & set(x.projections) for p in y.paths)
+	cc = lambda x, y: any(dom(s, y) for s in x.sisters)
+	tc = lambda x, y: not dom(x, y) and any(pc(s, y) and pc(m, y)
+											for s in x.sisters
+											for m in x.mothers)
+	for x in paper_tree:
+		assert set(paper_tree.related(x, 'ccommand')) == \
+			   {y for y in paper_tree if cc(x, y)}
+		assert set(paper_tree.related(x, 'tccommand')) == \
+			   {y for y in paper_tree if tc(x, y)}
+		assert set(paper_tree.related(x, 'asym_tccommand')) == \
+			   {y for y in paper_tree if tc(x, y) and not tc(y, x)}
+		assert set(paper_tree.related(x, 'path_command')) == \
+			   {y for y in paper_tree if pc(x, y)}
+
+def test_edits_match_reparse():
+	basic = parseTreeFile('trees/paper/Basic.txt')
+	moved = parseTreeFile('trees/paper/MovedSpec.txt')
+	changed = basic.remerge('CP', 'AP')
+	assert basic.fingerprint == moved.fingerprint
+	assert 'A2' in changed and 'C1' in changed
+	assert basic.remove_merge('AP', 'CP') == changed
+	assert basic.fingerprint == parseTreeFile('trees/paper/Basic.txt').fingerprint
+
+def test_bad_edit_leaves_tree():
+	basic = parseTreeFile('trees/paper/Basic.txt')
+	fingerprint = basic.fingerprint
+	with pytest.raises(TreeError):
+		basic.add_merge('B1', 'C1') # B2 would be a second root
+	with pytest.raises(TreeError):
+		basic.remove_merge('A', 'CP')
+	assert basic.fingerprint == fingerprint
+	assert basic.root is basic['AP']
+
+def test_out_of_order_merges():
+	n = 200
+	terminals = ', '.join(f'T{i}' for i in range(n))
+	merges = [f'T{i}0, T{i+1}1' for i in range(n - 1)] + [f'T{n-1}0']
+	tree = parseTreeString('\n'.join([terminals] + merges))
+	assert str(tree.root) == 'T01'
+	assert tree['T5P'].projections == [tree['T51']]
+	assert tree['T50'].projections == [tree['T50'], tree['T51']]
+
+def test_head_of_several_projections():
+	# B0 heads both the complex head B and B1; it projects both, in the
+	# order they were built
+	tree = parseTreeString("B, C, D\nD0\nB0, C0\nB0, D1\nB1, B\n")
+	assert [str(p) for p in tree['B0'].projections] == ['B0', 'B', 'B1', 'B2']
+	assert tree['BP'] is tree['B2']
+
+def test_merge_errors_report_lines():
+	with pytest.raises(TreeError, match = r"cycle.*line 2.*line 3"):
+		parseTreeString("A, B\nA0, B1\nB0, A1\n")
+	with pytest.raises(TreeError, match = r"'D1'.*line 4"):
+		parseTreeString("A, B\nB0\n\nA0, D1\n")
+	with pytest.raises(TreeError, match = r"A0, B1.*line 4.*A1"):
+		parseTreeString("A, B\nB0\nA0, B1\nA0, B1\n")
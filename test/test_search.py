@@ -0,0 +1,30 @@
+#! /usr/python
+
+import pytest
+from itertools import permutations
+from bin import tableau
+from bin import gen
+from bin import search
+
+
+def test_search_matches_tableau(tree, conlist):
+	t = tableau.Tableau(tree,
+						conlist,
+						gen = gen.Gen(lambda x: gen.gen_strings(x, null_phon = {'E'}))
+						)
+	s = search.Search(tree, conlist, null_phon = {'E'})
+
+	assert s.contenders == t.contenders
+	for ranking in permutations(conlist):
+		assert set(s.get_winners(ranking)) == set(t.get_winners(ranking))
+
+
+def test_solve_matches_tableau(tree, conlist):
+	t = tableau.Tableau(tree, conlist, gen = gen.Gen(null_phon = {'E'}))
+	for ranking in permutations(conlist):
+		winners, vector = search.solve(tree, ranking, null_phon = {'E'})
+		assert set(winners) == set(t.get_winners(ranking))
+		assert vector == tuple(t.vectors[winners[0]][conlist.index(c)]
+							   for c in ranking)
+		assert search.solve(tree, ranking, null_phon = {'E'},
+							limit = 2)[0] == winners[:2]
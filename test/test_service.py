@@ -0,0 +1,86 @@
+#! /usr/python
+
+import pytest
+import json
+import threading
+import urllib.request
+import urllib.error
+from bin import service
+from bin import mtree
+from bin import con
+from bin import tableau
+
+
+@pytest.fixture(scope = 'module')
+def server():
+	ready = threading.Event()
+	servers = []
+	def on_ready(s):
+		servers.append(s)
+		ready.set()
+	thread = threading.Thread(target = service.serve,
+							  kwargs = {'port': 0, 'ready': on_ready},
+							  daemon = True)
+	thread.start()
+	ready.wait(10)
+	yield('http://%s:%d' % servers[0].server_address)
+	servers[0].shutdown()
+	thread.join(10)
+
+
+def post(url, body):
+	request = urllib.request.Request(url, data = json.dumps(body).encode(),
+									 method = 'POST')
+	try:
+		with urllib.request.urlopen(request) as response:
+			return(response.status, json.load(response))
+	except urllib.error.HTTPError as e:
+		return(e.code, json.load(e))
+
+
+def read(fname):
+	with open(fname) as f:
+		return(f.read())
+
+
+def test_serve_tableau(server):
+	text = read('trees/paper/MovedSpec.txt')
+	status, body = post(server + '/tableau', {'tree': text, 'name': 'moved',
+											  'all': True})
+	assert status == 200
+	expected = tableau.Tableau(mtree.parseTreeString(text, name = 'moved'),
+							   con.build_constraints())
+	assert body == expected.to_json(include_bounded = True)
+	# again, warm, under another name
+	status, again = post(server + '/tableau', {'tree': text, 'name': 'again'})
+	assert again['contenders'] == body['contenders']
+	assert again['input'] == 'again'
+
+def test_serve_typology(server):
+	texts = [read('trees/paper/' + n + '.txt') for n in ('Basic', 'HighHead')]
+	specs = ['Antisymmetry', {'type': 'HeadFinality', 'alpha': 'BP'}]
+	status, body = post(server + '/typology', {'trees': texts,
+											   'names': ['basic', 'high'],
+											   'constraints': specs})
+	assert status == 200
+	trees = [mtree.parseTreeString(t, name = n)
+			 for t, n in zip(texts, ['basic', 'high'])]
+	expected = tableau.Typology(trees, con.build_constraints(specs))
+	assert body == expected.to_json()
+
+def test_serve_errors(server):
+	status, body = post(server + '/tableau', {'tree': 'A, B\nA0, B1\n'})
+	assert status == 400 and 'B1' in body['error']
+	status, body = post(server + '/tableau', {'tree': 'A\nA0\n',
+											  'constraints': ['Nope']})
+	assert status == 400 and 'Nope' in body['error']
+	status, body = post(server + '/tableau', {'tree': 'A\nA0\n',
+											  'alpha': 'QP'})
+	assert status == 400 and 'QP' in body['error']
+	status, body = post(server + '/typology', {'trees': ['A\nA0\n'],
+											   'constraints': [
+												   {'type': 'HeadFinality',
+													'alpha': 'QP'}]})
+	assert status == 400 and 'QP' in body['error']
+	status, _ = post(server + '/nothing', {})
+	assert status == 404
@@ -0,0 +1,39 @@
+#! /usr/python
+
+import pytest
+from bin import store
+
+
+@pytest.fixture
+def vectors():
+	return(store.VectorStore(2, [('abc', (0,1)), ('acb', (1,0)),
+								 ('bac', (0,1)), ('cab', (2,2))]))
+
+
+def test_store_lookup(vectors):
+	assert len(vectors) == 4
+	assert vectors['bac'] == (0,1)
+	assert list(vectors) == ['abc', 'acb', 'bac', 'cab']
+	with pytest.raises(KeyError):
+		vectors['cba']
+
+def test_store_inverse(vectors):
+	assert set(vectors.inverse) == {(0,1), (1,0), (2,2)}
+	assert vectors.inverse[(0,1)] == ['abc', 'bac']
+
+def test_store_extend(vectors):
+	merged = store.VectorStore(2)
+	merged.extend(vectors)
+	merged.extend(store.VectorStore(2, [('cba', (3,0))]))
+	assert merged.inverse[(0,1)] == ['abc', 'bac']
+	assert merged['cba'] == (3,0)
+
+def test_store_columns(vectors):
+	vectors.add_column([1, 0, 0, 3])
+	assert vectors['abc'] == (0,1,1)
+	assert vectors.inverse[(0,1,0)] == ['bac']
+	vectors.remove_column(0)
+	assert dict(vectors.items()) == {'abc': (1,1), 'acb': (0,0),
+									 'bac': (1,0), 'cab': (2,3)}
+	vectors.adjust([(0,0), (1,1), (0,0), (0,-3)])
+	assert vectors.inverse[(1,1)] == ['abc', 'acb']
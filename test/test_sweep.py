@@ -0,0 +1,31 @@
+#! /usr/python
+
+import pytest
+from bin import sweep
+from bin import tableau
+from bin import gen
+
+
+def test_trees_are_distinct():
+	trees = list(sweep.trees('ABC', moves = 1))
+	assert len({t.fingerprint for t in trees}) == len(trees) == 144
+	for tree in trees:
+		assert sorted(str(t) for t in tree.terminals) == ['A0', 'B0', 'C0']
+
+def test_shapes_ignore_labels():
+	assert len(list(sweep.trees('AB'))) == 4
+	assert len(list(sweep.trees('AB', labels = False))) == 2
+	assert len(list(sweep.trees('ABC', moves = 1, labels = False))) == 24
+
+def test_movement_budget():
+	for tree in sweep.trees('ABC', moves = 2):
+		remerged = [n for n in tree if len(n.mothers) > 1]
+		assert len(remerged) <= 2
+
+def test_sweep_matches_typology(conlist):
+	g = gen.Gen()
+	results = list(sweep.sweep('ABC', conlist, moves = 1, gen = g))
+	for tree, languages in results[::10]:
+		assert languages == tableau.Typology([tree], conlist, gen = g).languages
+	parallel = sweep.sweep('ABC', conlist, moves = 1, gen = g, workers = 2)
+	assert [l for _, l in parallel] == [l for _, l in results]
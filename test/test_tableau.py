@@ -0,0 +1,42 @@
+#! /usr/python
+
+import pytest
+from bin import mtree
+from bin import tableau
+from bin import gen
+
+
+def test_parallel_tableau_matches_serial(tree, conlist):
+	serial = tableau.Tableau(tree, conlist, gen = gen.Gen(null_phon = {'E'}))
+	parallel = tableau.Tableau(tree, conlist, gen = gen.Gen(null_phon = {'E'}),
+							   workers = 2)
+	assert list(parallel.vectors.items()) == list(serial.vectors.items())
+	assert parallel.contenders == serial.contenders
+
+
+def test_streaming_tableau_matches_full(tree, conlist):
+	full = tableau.Tableau(tree, conlist, gen = gen.Gen(null_phon = {'E'}))
+	streamed = tableau.Tableau(tree, conlist, gen = gen.Gen(null_phon = {'E'}),
+							   stream = True)
+	assert streamed.contenders == full.contenders
+	assert len(streamed.vectors) <= len(full.vectors)
+	assert streamed.gen.size == 0 # nothing cached
+	assert dict(streamed.bounded()) == dict(full.bounded())
+	assert streamed.print_ascii(include_bounded = True) == \
+		   full.print_ascii(include_bounded = True)
+
+
+def test_updated_tableau_matches_rebuilt(conlist):
+	edited = mtree.parseTreeFile('trees/paper/Basic.txt')
+	moved = mtree.parseTreeFile('trees/paper/MovedSpec.txt')
+	t = tableau.Tableau(edited, conlist)
+	edited.remerge('CP', 'AP')
+	t.update()
+	rebuilt = tableau.Tableau(moved, conlist)
+	assert dict(t.vectors.items()) == dict(rebuilt.vectors.items())
+	assert t.contenders == rebuilt.contenders
+
+
+def test_default_gen_keeps_no_candidates(tree, conlist):
+	t = tableau.Tableau(tree, conlist)
+	assert t.gen.size == 0 and len(t.vectors) > 0
@@ -0,0 +1,92 @@
+#! /usr/python
+
+import pytest
+from itertools import permutations
+from bin import mtree
+from bin import con
+from bin import tableau
+from bin import gen
+
+
+@pytest.fixture
+def trees():
+	return([mtree.parseTreeFile('trees/paper/' + name + '.txt')
+			for name in ["Basic", "MovedSpec", "HighHead", "LongHeadEmpty",
+						 "ComplexMovedSpec"]])
+
+@pytest.fixture
+def conlist(conlist):
+	# the shared constraints, and HeadFinality relativized to CP
+	return(conlist + [con.HeadFinality(alpha = 'CP')])
+
+
+def brute_force(typology):
+	# {language: rankings} by trying every ranking
+	languages = dict()
+	for ranking in permutations(typology.constraints):
+		languages.setdefault(typology.get_language(ranking), []).append(ranking)
+	return(languages)
+
+
+def test_languages_match_rankings(trees, conlist):
+	t = tableau.Typology(trees, conlist, gen = gen.Gen(null_phon = {'E'}))
+	expected = brute_force(t)
+	assert set(t.languages) == set(expected)
+
+	# The ranking conditions hold in every ranking of the language
+	for lang, rankings in expected.items():
+		for condition in t.summarize_rankings(t.languages[lang]):
+			for ranking in rankings:
+				if len(condition) == 1:
+					assert ranking[0] == condition[0]
+				else:
+					assert ranking.index(condition[0]) < ranking.index(condition[1])
+
+
+def test_parallel_typology_matches_serial(trees, conlist):
+	serial = tableau.Typology(trees, conlist, gen = gen.Gen(null_phon = {'E'}))
+	parallel = tableau.Typology(trees, conlist, gen = gen.Gen(null_phon = {'E'}),
+								workers = 2)
+	assert parallel.languages == serial.languages
+	assert [t.vectors for t in parallel.tableaux] == \
+		   [t.vectors for t in serial.tableaux]
+
+
+def test_edited_typology_matches_rebuilt(trees, conlist):
+	g = gen.Gen(null_phon = {'E'})
+	t = tableau.Typology(trees[:-1], conlist[:-1], gen = g)
+	t.add_input(trees[-1])
+	assert t.languages == tableau.Typology(trees, conlist[:-1], gen = g).languages
+	t.add_constraint(conlist[-1])
+	assert t.languages == tableau.Typology(trees, conlist, gen = g).languages
+	t.remove_input(trees[1])
+	rest = trees[:1] + trees[2:]
+	assert t.languages == tableau.Typology(rest, conlist, gen = g).languages
+	t.remove_constraint(conlist[0])
+	assert t.languages == tableau.Typology(rest, conlist[1:], gen = g).languages
+
+
+def test_compressed_typology_matches_full(trees, conlist):
+	# Relativized HeadFinality can't tell apart the terminals outside its
+	# domain, so there is something to compress
+	normal = lambda languages: {tuple(frozenset(l) for l in lang): ercs
+								for lang, ercs in languages.items()}
+	g = gen.Gen(null_phon = {'E'})
+	full = tableau.Typology(trees, conlist[2:], gen = g)
+	compressed = tableau.Typology(trees, conlist[2:], gen = g, compress = True)
+	assert normal(compressed.languages) == normal(full.languages)
+	assert sum(len(t.vectors) for t in compressed.tableaux) < \
+		   sum(len(t.vectors) for t in full.tableaux)
+	for c, f in zip(compressed.tableaux, full.tableaux):
+		assert c.contenders == f.contenders
+		assert dict(c.bounded()) == dict(f.bounded())
+		assert set(c.expand(c.vectors)) == set(f.vectors)
+
+	parallel = tableau.Typology(trees, conlist[2:], gen = g, compress = True,
+								workers = 2)
+	assert parallel.languages == compressed.languages
+
+	# a new constraint tells more terminals apart
+	compressed.add_constraint(conlist[0])
+	full.add_constraint(conlist[0])
+	assert normal(compressed.languages) == normal(full.languages)